@@ -1,28 +1,37 @@
 '''
-Helper for parsing of arguments
+Helper for parsing of arguments, and the registry of player styles that the
+arguments are looked up in
 '''
 
 import re
 
+# Player style classes by lower case name, filled in as the classes are
+# defined, see rps.PlayerStyle
+_STYLES = {}
 
-def parse_args(arg):
-    ''' Parse the arguments passed to the program'''
-    types = {
-        "rand": 0,
-        "seq": 1,
-        "hist": 2,
-        "freq": 3,
-        "otp": 4
-    }
+# The names of the player styles as they were registered, in that order
+_NAMES = []
 
-    hsize = 0
-    pstyle = 0
 
-    reg_match = re.match(r'hist\((\d*)\)', arg.lower())
-    if reg_match is not None:
-        hsize = int(reg_match.group(1))  # Get hsize captured in regex
-        pstyle = types.get('hist')
-    elif arg.lower() in types.keys():
-        pstyle = types.get(arg.lower())
+def register_style(name, style_class):
+    ''' Make <style_class> available as the player style <name> '''
+    if name.lower() not in _STYLES:
+        _NAMES.append(name)
+    _STYLES[name.lower()] = style_class
 
-    return pstyle, hsize
+
+def style_names():
+    ''' Get the names of all the registered player styles '''
+    return list(_NAMES)
+
+
+def parse_style(arg):
+    '''
+    Parse a player style argument like "Seq" or "Hist(2)". Return the
+    registered class and the string given in the parentheses, or None if
+    there are no parentheses.
+    '''
+    reg_match = re.match(r'\s*(\w+)\s*(?:\((.*)\))?\s*$', arg)
+    if reg_match is None or reg_match.group(1).lower() not in _STYLES:
+        raise ValueError('Unknown player style: {}'.format(arg))
+    return _STYLES[reg_match.group(1).lower()], reg_match.group(2)
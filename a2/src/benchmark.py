@@ -0,0 +1,168 @@
+'''
+Benchmarks of the Rock, Paper, Scissors simulation. Every scenario is seeded,
+so the same rounds are played each time, and the throughput and peak memory
+of each run are written to a JSON file.
+'''
+
+from time import perf_counter
+import getopt
+import json
+import os
+import platform
+import random
+import sys
+import tracemalloc
+import rps
+
+
+def single_game_setup(num_rounds):
+    ''' Play <num_rounds> rounds of Rand vs. Rand through SingleGame.play '''
+    game = rps.SingleGame(rps.Player('Rand'), rps.Player('Rand'))
+
+    def run():
+        for _ in range(num_rounds):
+            game.play()
+    return run
+
+
+def tournament_setup(style_1, style_2, num_rounds, batch):
+    '''
+    Play a tournament of <num_rounds> rounds between <style_1> and <style_2>
+    with MultipleGames.arrange_tournament, as a batch if <batch> is set and
+    the styles allow it
+    '''
+    games = rps.MultipleGames(rps.Player(style_1), rps.Player(style_2),
+                              num_games=num_rounds, batch=batch)
+    return games.arrange_tournament
+
+
+def scenarios(max_rounds, max_hist):
+    '''
+    Get the scenarios to run as tuples of (scenario, name, path, rounds,
+    setup), where setup() makes a fresh function that plays the rounds
+    '''
+    sizes = [10 ** exp for exp in range(4, 9) if 10 ** exp <= max_rounds]
+    for size in sizes:
+        yield ('single_game', 'Rand vs. Rand', 'scalar', size,
+               lambda size=size: single_game_setup(size))
+
+    for size in sizes:
+        for path in ('scalar', 'batch'):
+            yield ('tournament', 'Rand vs. Seq', path, size,
+                   lambda size=size, path=path: tournament_setup(
+                       'Rand', 'Seq', size, path == 'batch'))
+
+    for hist_size in range(1, max_hist + 1):
+        name = 'Hist({})'.format(hist_size)
+        for size in sizes:
+            yield ('history', name + ' vs. Rand', 'scalar', size,
+                   lambda size=size, name=name: tournament_setup(
+                       name, 'Rand', size, False))
+
+
+def measure(setup, seed):
+    '''
+    Time a run made by <setup>, then measure the peak memory of a second run
+    on its own, as tracing the memory slows everything down. Return the time
+    in seconds and the peak memory in bytes.
+    '''
+    random.seed(seed)
+    run = setup()
+    start = perf_counter()
+    run()
+    seconds = perf_counter() - start
+
+    random.seed(seed)
+    run = setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return seconds, peak
+
+
+def run_benchmarks(max_rounds=10 ** 5, max_hist=8, seed=0, verbose=True):
+    ''' Run all the scenarios and return the results as a list of dicts '''
+    results = []
+    for scenario, name, path, rounds, setup in scenarios(max_rounds,
+                                                         max_hist):
+        seconds, peak = measure(setup, seed)
+        result = {
+            'scenario': scenario,
+            'name': name,
+            'path': path,
+            'rounds': rounds,
+            'seconds': seconds,
+            'rounds_per_second': rounds / seconds,
+            'peak_memory_bytes': peak
+        }
+        results += [result]
+        if verbose:
+            print('{:<12}{:<20}{:<8}{:>10} rounds: {:>12.0f} rounds/s, '
+                  '{:>10} bytes'.format(scenario, name, path, rounds,
+                                        result['rounds_per_second'], peak))
+    return results
+
+
+def usage():
+    '''
+    Print usage
+    '''
+    return '''Usage: python {0} [OPTS]
+Options:
+        -n <max_rounds> :  Largest number of rounds to play, the scenarios
+                           are run at 10^4, 10^5, ... up to this. Defaults
+                           to 100000
+        -k <max_hist>   :  Benchmark Hist(1) to Hist(<max_hist>). Defaults
+                           to 8
+        -s <seed>       :  Seed for every run. Defaults to 0
+        -o <file>       :  Write the results to <file>. Defaults to
+                           benchmark.json
+        -h              :  Print help (this)
+    '''.format(os.path.basename(__file__))
+
+
+def main():
+    """
+    Run the benchmarks
+    """
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], "n:k:s:o:h", [
+            "maxrounds=", "maxhist=", "seed=", "output=", "help"
+        ])
+    except getopt.GetoptError as err:
+        print(str(err))
+        print(usage())
+        sys.exit(2)
+
+    max_rounds = 10 ** 5
+    max_hist = 8
+    seed = 0
+    out_file = 'benchmark.json'
+    for opt, arg in opts:
+        if opt in ("-n", "--maxrounds"):
+            max_rounds = int(arg)
+        elif opt in ("-k", "--maxhist"):
+            max_hist = int(arg)
+        elif opt in ("-s", "--seed"):
+            seed = int(arg)
+        elif opt in ("-o", "--output"):
+            out_file = arg
+        elif opt in ("-h", "--help"):
+            print(usage())
+            sys.exit(0)
+
+    results = run_benchmarks(max_rounds, max_hist, seed)
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': seed,
+        'results': results
+    }
+    with open(out_file, 'w') as json_file:
+        json.dump(report, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
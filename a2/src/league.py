@@ -0,0 +1,139 @@
+'''
+Play a round-robin league of Rock, Paper, Scissors between all the player
+styles, with the matches spread out over several processes
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import getopt
+import os
+import random
+import sys
+import argparser as ap
+import rps
+
+
+def league_styles(max_hist=3):
+    '''
+    Get the names of all the registered player styles, with Hist as
+    Hist(1..max_hist)
+    '''
+    styles = []
+    for name in ap.style_names():
+        if name == 'Hist':
+            styles += ['Hist({})'.format(k) for k in range(1, max_hist + 1)]
+        else:
+            styles += [name]
+    return styles
+
+
+def play_match(style_1, style_2, num_games, seed):
+    '''
+    Play a match of <num_games> rounds between the styles named <style_1> and
+    <style_2>, and return the win rate of <style_1>. A tie counts as half a
+    win. Only the names are sent to the worker, where the player styles are
+    made after seeding the random module with <seed>, so a match always plays
+    out the same way.
+    '''
+    random.seed(seed)
+    p_1 = rps.Player(play_style=style_1)
+    p_2 = rps.Player(play_style=style_2)
+
+    games = rps.MultipleGames(p_1, p_2, num_games=num_games)
+    p_1_score, _ = games.arrange_tournament()
+    return p_1_score / num_games
+
+
+def arrange_league(styles, num_games=1000, seed=0, workers=None):
+    '''
+    Play every pairing of <styles> against each other and return the win rate
+    matrix, where row i, column j holds the win rate of styles[i] against
+    styles[j]. A style does not play itself, so the diagonal is None.
+    '''
+    pairings = list(combinations(range(len(styles)), 2))
+
+    # Draw the seeds up front, in the order of the pairings, so they do not
+    # depend on which worker ends up playing which match
+    seed_rng = random.Random(seed)
+    seeds = [seed_rng.getrandbits(32) for _ in pairings]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        win_rates = executor.map(play_match,
+                                 [styles[i] for i, _ in pairings],
+                                 [styles[j] for _, j in pairings],
+                                 [num_games] * len(pairings),
+                                 seeds)
+
+        matrix = [[None] * len(styles) for _ in styles]
+        for (i, j), win_rate in zip(pairings, win_rates):
+            matrix[i][j] = win_rate
+            matrix[j][i] = 1 - win_rate
+
+    return matrix
+
+
+def print_matrix(styles, matrix):
+    ''' Print the win rate matrix with a row and a column per style '''
+    print(' ' * 10 + ''.join(style.rjust(10) for style in styles))
+    for style, row in zip(styles, matrix):
+        cells = ['-' if rate is None else '{:.3f}'.format(rate)
+                 for rate in row]
+        print(style.rjust(10) + ''.join(cell.rjust(10) for cell in cells))
+
+
+def usage():
+    '''
+    Print usage
+    '''
+    return '''Usage: python {0} [OPTS]
+Options:
+        -n <num_games> :  Play <num_games> rounds per match. Defaults to 1000
+        -k <max_hist>  :  Include Hist(1) to Hist(<max_hist>). Defaults to 3
+        -j <workers>   :  Number of worker processes. Defaults to the number
+                          of CPUs
+        -s <seed>      :  Seed the matches are drawn from. Defaults to 0
+        -h             :  Print help (this)
+
+Plays every player style rps.py knows against each other, with Hist as
+Hist(1..<max_hist>), and prints the win rate of each row against each column.
+    '''.format(os.path.basename(__file__))
+
+
+def main():
+    """
+    Play an RPS league
+    """
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], "n:k:j:s:h", [
+            "numgames=", "maxhist=", "workers=", "seed=", "help"
+        ])
+    except getopt.GetoptError as err:
+        print(str(err))
+        print(usage())
+        sys.exit(2)
+
+    ngames = 1000
+    max_hist = 3
+    workers = None
+    seed = 0
+    for opt, arg in opts:
+        if opt in ("-n", "--numgames"):
+            ngames = int(arg)
+        elif opt in ("-k", "--maxhist"):
+            max_hist = int(arg)
+        elif opt in ("-j", "--workers"):
+            workers = int(arg)
+        elif opt in ("-s", "--seed"):
+            seed = int(arg)
+        elif opt in ("-h", "--help"):
+            print(usage())
+            sys.exit(0)
+
+    styles = league_styles(max_hist)
+    matrix = arrange_league(styles, num_games=ngames, seed=seed,
+                            workers=workers)
+    print_matrix(styles, matrix)
+
+
+if __name__ == '__main__':
+    main()
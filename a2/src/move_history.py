@@ -0,0 +1,69 @@
+'''
+Compact storage of the moves made by a player
+'''
+
+import sys
+
+
+class MoveHistory():
+    '''
+    The moves of a player, stored one byte each. If <max_window> is given
+    only the <max_window> newest moves are kept, in a ring buffer, and the
+    oldest move is dropped when a new one is added.
+    '''
+
+    def __init__(self, max_window=None):
+        if max_window is not None and max_window < 1:
+            raise ValueError('max_window must be at least 1')
+        self.max_window = max_window
+        self.moves = bytearray(max_window or 0)
+        self.start = 0
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        ''' Get a move by its index in the window, negative counts from
+        the newest move '''
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('move index out of range')
+        if self.max_window is None:
+            return self.moves[index]
+        return self.moves[(self.start + index) % self.max_window]
+
+    def is_full(self):
+        ''' Check if the next move will push the oldest move out '''
+        return self.length == self.max_window
+
+    def append(self, move):
+        '''
+        Add <move> as the newest move. Return the move that was pushed out
+        of the window, or None if no move was dropped.
+        '''
+        if self.max_window is None:
+            self.moves.append(move)
+            self.length += 1
+            return None
+
+        if self.length < self.max_window:
+            self.moves[(self.start + self.length) % self.max_window] = move
+            self.length += 1
+            return None
+
+        oldest = self.moves[self.start]
+        self.moves[self.start] = move
+        self.start = (self.start + 1) % self.max_window
+        return oldest
+
+    def memory_usage(self):
+        ''' Number of bytes used to store the moves '''
+        return sys.getsizeof(self.moves)
+
+    def reset(self):
+        ''' Forget all the moves '''
+        self.moves = bytearray(self.max_window or 0)
+        self.start = 0
+        self.length = 0
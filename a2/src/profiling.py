@@ -0,0 +1,97 @@
+'''
+Latency histograms for profiling the phases of a round
+'''
+
+from time import perf_counter_ns
+
+# Each power of two is split into 2^(_SUB_BITS - 1) buckets, so a recorded
+# time is off by at most 1/8 of its value
+_SUB_BITS = 4
+_SUB_COUNT = 1 << _SUB_BITS
+_HALF_SUB = _SUB_COUNT // 2
+
+
+def _bucket(value):
+    ''' Index of the bucket holding <value> '''
+    shift = max(value.bit_length() - _SUB_BITS, 0)
+    return shift * _HALF_SUB + (value >> shift)
+
+
+def _bucket_start(index):
+    ''' Smallest value in bucket <index> '''
+    if index < _SUB_COUNT:
+        return index
+    shift = (index - _SUB_COUNT) // _HALF_SUB + 1
+    return (index - shift * _HALF_SUB) << shift
+
+
+class LatencyHistogram():
+    '''
+    Histogram of times in nanoseconds with logarithmic buckets, in the style
+    of HdrHistogram. Recording is a couple of integer operations, and the
+    memory use only grows with the logarithm of the largest time.
+    '''
+
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        ''' Add a time of <value> nanoseconds '''
+        index = _bucket(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        ''' Lower bound of the bucket holding the <percent>th percentile '''
+        if self.count == 0:
+            return 0
+        rank = percent / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if bucket_count > 0 and seen >= rank:
+                return _bucket_start(index)
+        return self.max
+
+    def mean(self):
+        ''' Mean of the recorded times '''
+        return self.total / self.count if self.count else 0
+
+
+class RoundProfiler():
+    '''
+    Latency histograms of the phases of a round, kept per player and style,
+    e.g. ('P1 Historical(2)', 'choose_action')
+    '''
+
+    def __init__(self):
+        self.histograms = {}
+        self.clock = perf_counter_ns
+
+    def record(self, name, phase, value):
+        ''' Add a time of <value> nanoseconds for <phase> of <name> '''
+        key = (name, phase)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.record(value)
+
+    def summary(self):
+        ''' Table of the count and the times in microseconds of each phase '''
+        lines = ['{:<25}{:<15}{:>10}{:>10}{:>10}{:>10}{:>10}{:>10}'.format(
+            'Name', 'Phase', 'Count', 'Mean', 'p50', 'p90', 'p99', 'Max')]
+        for (name, phase), hist in sorted(self.histograms.items()):
+            lines += ['{:<25}{:<15}{:>10}{:>10.2f}{:>10.2f}{:>10.2f}'
+                      '{:>10.2f}{:>10.2f}'.format(
+                          name, phase, hist.count, hist.mean() / 1000,
+                          hist.percentile(50) / 1000,
+                          hist.percentile(90) / 1000,
+                          hist.percentile(99) / 1000, hist.max / 1000)]
+        return '\n'.join(lines)
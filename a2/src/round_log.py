@@ -0,0 +1,122 @@
+'''
+Streaming log of the rounds played in a tournament
+'''
+
+import os
+import numpy as np
+
+# One record per round. winner is 0 for a tie, 1 if player 1 won and 2 if
+# player 2 won. score is player 1's total score after the round.
+ROUND_DTYPE = np.dtype([
+    ('p1_move', 'u1'),
+    ('p2_move', 'u1'),
+    ('winner', 'u1'),
+    ('score', '<f8')
+])
+
+_CSV_HEADER = 'p1_move,p2_move,winner,score\n'
+
+
+class RoundWriter():
+    '''
+    Write rounds to <path> in chunks of <chunk_size> rounds, so only one chunk
+    is kept in memory. A path ending in .csv is written as text, anything else
+    as packed binary records of ROUND_DTYPE. If <resume_size> is given the
+    log is cut to that many bytes and continued, see size().
+    '''
+
+    def __init__(self, path, chunk_size=1 << 16, resume_size=None):
+        self.path = path
+        self.csv = path.endswith('.csv')
+        self.chunk = np.empty(chunk_size, dtype=ROUND_DTYPE)
+        self.chunk_len = 0
+        if resume_size is None:
+            self.file = open(path, 'w' if self.csv else 'wb')
+            if self.csv:
+                self.file.write(_CSV_HEADER)
+        else:
+            os.truncate(path, resume_size)
+            self.file = open(path, 'a' if self.csv else 'ab')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_round(self, p1_move, p2_move, winner, score):
+        ''' Add a single round '''
+        self.chunk[self.chunk_len] = (p1_move, p2_move, winner, score)
+        self.chunk_len += 1
+        if self.chunk_len == len(self.chunk):
+            self.flush()
+
+    def write_rounds(self, p1_moves, p2_moves, winners, scores):
+        ''' Add a batch of rounds given as arrays '''
+        self.flush()
+        rounds = np.empty(len(scores), dtype=ROUND_DTYPE)
+        rounds['p1_move'] = p1_moves
+        rounds['p2_move'] = p2_moves
+        rounds['winner'] = winners
+        rounds['score'] = scores
+        self._write(rounds)
+
+    def flush(self):
+        ''' Write the rounds kept in memory to the file '''
+        if self.chunk_len > 0:
+            self._write(self.chunk[:self.chunk_len])
+            self.chunk_len = 0
+
+    def size(self):
+        ''' Write out the rounds kept in memory and get the size of the log '''
+        self.flush()
+        self.file.flush()
+        return os.path.getsize(self.path)
+
+    def close(self):
+        ''' Write the remaining rounds and close the file '''
+        self.flush()
+        self.file.close()
+
+    def _write(self, rounds):
+        if self.csv:
+            np.savetxt(self.file, rounds, fmt=['%d', '%d', '%d', '%.1f'],
+                       delimiter=',')
+        else:
+            rounds.tofile(self.file)
+
+
+def read_averages(path, max_points=2000):
+    '''
+    Read player 1's average score after each round from the log at <path>,
+    keeping at most about <max_points> evenly spaced rounds. Returns the round
+    numbers (counted from 0) and the averages.
+    '''
+    if path.endswith('.csv'):
+        return _read_csv_averages(path, max_points)
+
+    # An empty file can not be mapped
+    if os.path.getsize(path) == 0:
+        return np.arange(0), np.empty(0)
+
+    rounds = np.memmap(path, dtype=ROUND_DTYPE, mode='r')
+    step = max(1, -(-len(rounds) // max_points))
+    indices = np.arange(0, len(rounds), step)
+    return indices, rounds['score'][::step] / (indices + 1)
+
+
+def _read_csv_averages(path, max_points):
+    ''' Like read_averages, reading the CSV log one line at a time '''
+    with open(path, 'r') as log:
+        num_rounds = sum(1 for _ in log) - 1
+    step = max(1, -(-num_rounds // max_points))
+
+    indices = []
+    averages = []
+    with open(path, 'r') as log:
+        next(log)
+        for i, line in enumerate(log):
+            if i % step == 0:
+                indices += [i]
+                averages += [float(line.rsplit(',', 1)[1]) / (i + 1)]
+    return np.array(indices), np.array(averages)
@@ -3,12 +3,20 @@ Simulate rounds of Rock, Paper, Scissors
 '''
 
 from abc import ABC, abstractmethod
+from statistics import NormalDist
 import getopt
+import math
+import pickle
 import random
 import sys
 import os
-import matplotlib.pyplot as plt
+import tempfile
+import numpy as np
 import argparser as ap
+from move_history import MoveHistory
+from round_log import RoundWriter, read_averages
+from suffix_automaton import SuffixAutomaton
+from profiling import RoundProfiler
 
 _ROCK = 0
 _SCISSOR = 1
@@ -20,39 +28,64 @@ _HIST = 2
 _FREQ = 3
 _OTP = 4
 
+# Player style arguments for the constants above
+_STYLE_ARGS = {
+    _RAND: 'Rand',
+    _SEQ: 'Seq',
+    _HIST: 'Hist({})',
+    _FREQ: 'Freq',
+    _OTP: 'OTP'
+}
 
-class Player():
-    '''
-    Class representing a player with a given play style
-    '''
+# Winner of a round indexed by [p1_move][p2_move]: 0 for a tie, 1 for
+# player 1 and 2 for player 2. Each move beats the one after it: rock beats
+# scissors, scissors beats paper and paper beats rock
+_ROUND_WINNER = ((0, 1, 2),
+                 (2, 0, 1),
+                 (1, 2, 0))
 
-    def __init__(self, play_style=_RAND, hist=0):
+# What each player gets in Player.get_result, indexed by the winner above
+_ROUND_POINTS = ((None, None), (1, 0), (0, 1))
 
-        # Choose a class to make action choices
-        if play_style == _RAND:
-            self.player_style = Rand()
+# Score for player 1 and the winner as arrays, for playing batches of rounds
+_OUTCOME = np.array([[0.5, 1.0, 0.0],
+                     [0.0, 0.5, 1.0],
+                     [1.0, 0.0, 0.5]])
+_WINNER = np.array(_ROUND_WINNER, dtype=np.uint8)
 
-        elif play_style == _SEQ:
-            self.player_style = Seq()
+# The Action for each move, see Action
+_ACTIONS = {}
 
-        elif play_style == _HIST:
-            self.player_style = History(hist_size=hist)
+# Number of rounds played per chunk in a batch tournament
+_BATCH_CHUNK = 1 << 20
 
-        elif play_style == _FREQ:
-            self.player_style = Freq()
 
-        elif play_style == _OTP:
-            self.player_style = OneTrickPony()
+class Player():
+    '''
+    Class representing a player with a given play style
+    '''
+
+    def __init__(self, play_style=_RAND, hist=0, window=None):
+
+        # <play_style> is either one of the style constants or an argument
+        # naming a registered style, like "Hist(2)". The style is made right
+        # away, since some styles draw random numbers when they are made and
+        # the draws must come in the same order however the game is played.
+        # <window> limits how many of the opponents moves the History and
+        # Freq styles remember
+        if not isinstance(play_style, str):
+            play_style = _STYLE_ARGS[play_style].format(hist)
+        style_class, style_params = ap.parse_style(play_style)
+        self.player_style = style_class.from_args(style_params,
+                                                  max_window=window)
 
         self.score = 0
 
     def get_result(self, opp_move=None, winner=None):
         ''' Get result of the last round played '''
 
-        # If the player_style is history or freq, update the list of the
-        # oppenents moves
-        if isinstance(self.player_style, (Freq, History)):
-            self.player_style.add_opp_move(int(opp_move))
+        # Let the player_style know the oppenents move
+        self.player_style.add_opp_move(int(opp_move))
 
         if winner is None:
             self.score += 0.5     # tie
@@ -65,13 +98,16 @@ class Player():
 
     def choose_action(self):
         ''' Get the next move from the player style object '''
-        move = self.player_style.make_move()
-        return Action(move)
+        return _ACTIONS[self.player_style.make_move()]
 
     def get_score(self):
         ''' Return accumulated score'''
         return self.score
 
+    def memory_usage(self):
+        ''' Number of bytes the player style uses to remember the game '''
+        return self.player_style.memory_usage()
+
     def reset(self):
         ''' Reset modified values after a tournament '''
         self.score = 0
@@ -83,6 +119,34 @@ class PlayerStyle(ABC):
     Abstract class  with methods that all the player style classes most
     implement
     '''
+
+    # Number of random draws a style uses per move if it can precompute its
+    # moves, None if the moves depend on the game. Styles that set it also
+    # implement make_moves(num_moves, draws), which returns the next
+    # <num_moves> moves as an array given <batch_draws> values of
+    # random.randint(0, 2) per move in <draws>
+    batch_draws = None
+
+    def __init_subclass__(cls, name=None, **kwargs):
+        '''
+        Register subclasses defined with a name, e.g.
+        class Rand(PlayerStyle, name='Rand'), so they can be chosen by name
+        '''
+        super().__init_subclass__(**kwargs)
+        if name is not None:
+            ap.register_style(name, cls)
+
+    @classmethod
+    def from_args(cls, params, max_window=None):
+        '''
+        Make a player style from the parameter string <params> given in the
+        parentheses of its argument, None if there were none. Styles that
+        remember the opponents moves keep at most <max_window> of them.
+        '''
+        if params:
+            raise ValueError('{} takes no parameters'.format(cls.__name__))
+        return cls()
+
     @abstractmethod
     def make_move(self):
         ''' Get the move chosen by the given player style'''
@@ -95,15 +159,27 @@ class PlayerStyle(ABC):
     def reset(self):
         ''' Reset modified values after a tournament '''
 
+    def add_opp_move(self, opp_move):
+        ''' Update the style with the opponents last move '''
+
+    def memory_usage(self):
+        ''' Number of bytes used to remember the game '''
+        return 0
 
-class Rand(PlayerStyle):
+
+class Rand(PlayerStyle, name='Rand'):
     '''
     Select a move randomly each time
     '''
 
+    batch_draws = 1
+
     def make_move(self):
         return random.randint(0, 2)
 
+    def make_moves(self, num_moves, draws):
+        return draws[:, 0]
+
     def get_name(self):
         return 'Random'
 
@@ -111,11 +187,13 @@ class Rand(PlayerStyle):
         pass
 
 
-class Seq(PlayerStyle):
+class Seq(PlayerStyle, name='Seq'):
     '''
     Play each move sequentially: rock, paper, scissors, rock, paper...
     '''
 
+    batch_draws = 0
+
     def __init__(self):
         self.loop_count = 0
 
@@ -123,6 +201,12 @@ class Seq(PlayerStyle):
         self.loop_count = (self.loop_count + 1) % 3
         return self.loop_count
 
+    def make_moves(self, num_moves, draws):
+        moves = (self.loop_count + np.arange(1, num_moves + 1)) % 3
+        if num_moves > 0:
+            self.loop_count = int(moves[-1])
+        return moves
+
     def get_name(self):
         return 'Sequential'
 
@@ -130,88 +214,303 @@ class Seq(PlayerStyle):
         self.loop_count = 0
 
 
-class Freq(PlayerStyle):
+class Predictor(PlayerStyle):
     '''
-    Choose the opposite move of the opponents most frequent move
+    Base class for the player styles that predict the opponents next move
+    and play the move that beats it. Subclasses only implement predict.
     '''
 
-    def __init__(self):
+    def make_move(self):
+        prediction = self.predict()
+        if prediction is None:
+            # Nothing to go on yet, choose a random move
+            return random.randint(0, 2)
+
+        # Return the move that beats the predicted move
+        return (prediction - 1) % 3
+
+    @abstractmethod
+    def predict(self):
+        ''' Predict the opponents next move, None if there is no guess '''
+
+
+class Freq(Predictor, name='Freq'):
+    '''
+    Choose the opposite move of the opponents most frequent move. With a
+    <max_window> only the <max_window> last moves of the opponent are counted.
+    '''
+
+    def __init__(self, max_window=None):
         self.move_count = [0, 0, 0]
 
-    def make_move(self):
+        # The moves only need to be kept to know which one to stop counting
+        self.opp_hist = (MoveHistory(max_window) if max_window is not None
+                         else None)
+
+    @classmethod
+    def from_args(cls, params, max_window=None):
+        if params:
+            raise ValueError('Freq takes no parameters')
+        return cls(max_window=max_window)
+
+    def predict(self):
+        '''
+        Predict the opponents next move, None if there are no moves counted
+        '''
         if self.move_count == [0, 0, 0]:
-            return random.randint(0, 2)
+            return None
 
         # The index of the max value in move_count will be the move most often
-        # done by the opponent -> return the move that beats this move:
-        return (self.move_count.index(max(self.move_count)) - 1) % 3
+        # done by the opponent
+        return self.move_count.index(max(self.move_count))
 
     def add_opp_move(self, opp_move):
         ''' Update the list of the opponents moves '''
         self.move_count[int(opp_move)] += 1
+        if self.opp_hist is not None:
+            dropped = self.opp_hist.append(opp_move)
+            if dropped is not None:
+                self.move_count[dropped] -= 1
 
     def get_name(self):
         return 'Frequency'
 
+    def memory_usage(self):
+        if self.opp_hist is None:
+            return 0
+        return self.opp_hist.memory_usage()
+
     def reset(self):
         self.move_count = [0, 0, 0]
+        if self.opp_hist is not None:
+            self.opp_hist.reset()
 
 
-class History(PlayerStyle):
+class History(Predictor, name='Hist'):
     '''
     Keep a list of the opponents moves and check for the historically most
     likely move base on the hist_size last moves.
+
+    The moves that came after each sequence of <hist_size> moves are counted
+    as the moves come in, in a table keyed by the sequence packed as a base 3
+    number, so a move is a lookup instead of a search through the history.
+    With a <max_window> only the <max_window> last moves of the opponent are
+    remembered.
     '''
 
-    def __init__(self, hist_size=0):
-        self.opp_hist = []
+    def __init__(self, hist_size=0, max_window=None):
+        self.opp_hist = MoveHistory(max_window)
         self.hist_size = hist_size
-
-    def make_move(self):
+        self.context_size = 3 ** hist_size
+        self.next_counts = {}
+        self.context = 0
+        self.prev_context = 0
+
+    @classmethod
+    def from_args(cls, params, max_window=None):
+        ''' <params> is the history size, 0 if not given '''
+        return cls(hist_size=int(params or 0), max_window=max_window)
+
+    def predict(self):
+        '''
+        Predict the opponents next move, None if the history is too short
+        '''
         if len(self.opp_hist) < self.hist_size + 1:
-            # History is not big enough yet, choose a random move
-            return random.randint(0, 2)
-
-        # Get the <hist_size> last moves done by the opponent
-        last_moves = self.opp_hist[-self.hist_size:]
-
-        # Count of how many times the moves came after these last moves
-        # previously
-        move_count = [0, 0, 0]
+            return None
 
-        # Loop through the history to find slices equal to <last_moves>, add
-        # the move after a matching slice to move_count
-        for i in range(len(self.opp_hist) - self.hist_size - 1):
-            if self.opp_hist[i:i+self.hist_size] == last_moves:
-                next_move = self.opp_hist[i+self.hist_size]
-                move_count[next_move] += 1
+        # Count of how many times the moves came after the <hist_size> last
+        # moves previously
+        move_count = self.next_counts.get(self.context, [0, 0, 0])
 
         # The index of the max value in move_count will be the move most often
-        # done after the last_moves -> return the move that beats this move:
-        return (move_count.index(max(move_count)) - 1) % 3
+        # done after the last moves
+        return move_count.index(max(move_count))
 
     def add_opp_move(self, opp_move):
         ''' Update the list of the opponents moves '''
-        self.opp_hist += [opp_move]
+        # Count the move before this one as coming after its context. The
+        # newest move is not counted until the next one comes in, just like
+        # the newest move is left out when searching the history. A history
+        # size of 0 matches the whole history, which never repeats.
+        if self.hist_size > 0 and len(self.opp_hist) > self.hist_size:
+            move_count = self.next_counts.setdefault(self.prev_context,
+                                                     [0, 0, 0])
+            move_count[self.opp_hist[-1]] += 1
+
+            # Stop counting the move after the oldest context when the oldest
+            # move is about to be dropped from the window
+            if self.opp_hist.is_full():
+                oldest_context = 0
+                for i in range(self.hist_size):
+                    oldest_context = oldest_context * 3 + self.opp_hist[i]
+                self.next_counts[oldest_context][
+                    self.opp_hist[self.hist_size]] -= 1
+
+        self.prev_context = self.context
+        self.context = (self.context * 3 + opp_move) % self.context_size
+        self.opp_hist.append(opp_move)
 
     def get_name(self):
         return 'Historical({})'.format(self.hist_size)
 
+    def memory_usage(self):
+        # Each context in the table holds a list of three counts
+        table_size = sys.getsizeof(self.next_counts) + sum(
+            sys.getsizeof(count) for count in self.next_counts.values())
+        return self.opp_hist.memory_usage() + table_size
+
     def reset(self):
-        self.opp_hist = []
+        self.opp_hist.reset()
+        self.next_counts = {}
+        self.context = 0
+        self.prev_context = 0
 
 
-class OneTrickPony(PlayerStyle):
+class SeqDetector():
+    '''
+    Predict that the opponent plays sequentially, like Seq does. Only used as
+    an expert in Meta.
+    '''
+
+    def __init__(self):
+        self.last_move = None
+
+    def predict(self):
+        ''' Predict the move after the opponents last move '''
+        if self.last_move is None:
+            return None
+        return (self.last_move + 1) % 3
+
+    def add_opp_move(self, opp_move):
+        ''' Remember the opponents last move '''
+        self.last_move = opp_move
+
+    def memory_usage(self):
+        ''' Only the last move is kept '''
+        return 0
+
+    def reset(self):
+        ''' Forget the last move '''
+        self.last_move = None
+
+
+class Meta(Predictor, name='Meta'):
+    '''
+    Run Freq, History for each size in <hist_sizes> and a sequence detector
+    side by side as experts predicting the opponents next move, and play
+    against the prediction of the expert that has been right most often
+    lately. The hit count of each expert decays by <decay> every round, so
+    the player follows an opponent that changes its play.
+
+    Every expert updates in constant time, so a round costs the same no
+    matter how long the game has gone on.
+    '''
+
+    def __init__(self, hist_sizes=(1, 2, 3), decay=0.98, max_window=None):
+        self.hist_sizes = tuple(hist_sizes)
+        self.decay = decay
+        self.experts = ([Freq(max_window=max_window)] +
+                        [History(hist_size=size, max_window=max_window)
+                         for size in self.hist_sizes] +
+                        [SeqDetector()])
+        self.hits = [0.0] * len(self.experts)
+        self.predictions = [None] * len(self.experts)
+
+    @classmethod
+    def from_args(cls, params, max_window=None):
+        ''' <params> is a comma separated list of history sizes '''
+        if not params:
+            return cls(max_window=max_window)
+        hist_sizes = [int(size) for size in params.split(',')]
+        return cls(hist_sizes=hist_sizes, max_window=max_window)
+
+    def predict(self):
+        '''
+        Predict the opponents next move as the expert with the most hits
+        that has a prediction does, the first one on a tie. The predictions
+        of all the experts are kept to be scored in add_opp_move.
+        '''
+        self.predictions = [expert.predict() for expert in self.experts]
+
+        best = None
+        for hits, prediction in zip(self.hits, self.predictions):
+            if prediction is not None and (best is None or hits > best[0]):
+                best = (hits, prediction)
+        return None if best is None else best[1]
+
+    def add_opp_move(self, opp_move):
+        ''' Score the predictions of the experts and update them '''
+        for i, expert in enumerate(self.experts):
+            hit = 1.0 if self.predictions[i] == opp_move else 0.0
+            self.hits[i] = self.hits[i] * self.decay + hit
+            expert.add_opp_move(opp_move)
+        self.predictions = [None] * len(self.experts)
+
+    def get_name(self):
+        return 'Meta({})'.format(','.join(str(size)
+                                          for size in self.hist_sizes))
+
+    def memory_usage(self):
+        return sum(expert.memory_usage() for expert in self.experts)
+
+    def reset(self):
+        for expert in self.experts:
+            expert.reset()
+        self.hits = [0.0] * len(self.experts)
+        self.predictions = [None] * len(self.experts)
+
+
+class Pattern(Predictor, name='Pattern'):
+    '''
+    Find the longest run of the opponents latest moves that has been played
+    before, of any length, and expect the move that came after it that time.
+    The matching is done with a suffix automaton of the opponents moves, so
+    each move costs amortized constant time however long the game gets.
+    '''
+
+    def __init__(self):
+        self.automaton = SuffixAutomaton()
+
+    def predict(self):
+        '''
+        Predict the opponents next move, None if the last move has not been
+        played before
+        '''
+        length, end = self.automaton.longest_match()
+        if length == 0:
+            return None
+        return self.automaton.moves[end + 1]
+
+    def add_opp_move(self, opp_move):
+        ''' Add the opponents move to the automaton '''
+        self.automaton.add(opp_move)
+
+    def get_name(self):
+        return 'Pattern'
+
+    def memory_usage(self):
+        return self.automaton.memory_usage()
+
+    def reset(self):
+        self.automaton.reset()
+
+
+class OneTrickPony(PlayerStyle, name='OTP'):
     '''
     Dumbest strategy. Pick one move and stick to it
     '''
 
+    batch_draws = 0
+
     def __init__(self):
         self.move = random.randint(0, 2)
 
     def make_move(self):
         return self.move
 
+    def make_moves(self, num_moves, draws):
+        return np.full(num_moves, self.move)
+
     def get_name(self):
         move_name = str(Action(self.move))
         return 'OneTrickPony({})'.format(move_name)
@@ -222,26 +521,36 @@ class OneTrickPony(PlayerStyle):
 
 class Action():
     '''
-    Class for representation of the moves in RPS
+    Class for representation of the moves in RPS. An Action can not be
+    changed, and there is only one for each move: Action(move) returns the
+    shared one, so playing a round does not create any objects.
     '''
 
-    def __init__(self, move=None):
-        self.move = move
+    __slots__ = ('move',)
+
+    def __new__(cls, move=None):
+        action = _ACTIONS.get(move)
+        if action is None:
+            action = super().__new__(cls)
+            object.__setattr__(action, 'move', move)
+        return action
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Action is immutable')
+
+    def __reduce__(self):
+        return (Action, (self.move,))
 
     def __eq__(self, ac2):
-        return self.move == ac2.move
+        return self is ac2 or self.move == ac2.move
+
+    def __hash__(self):
+        return hash(self.move)
 
     def __gt__(self, ac2):
-        # Rock beats scissors
-        if (self.move == _ROCK and ac2.move == _SCISSOR):
-            return True
-        # Scissors beats paper
-        if (self.move == _SCISSOR and ac2.move == _PAPER):
-            return True
-        # Paper beats rock
-        if (self.move == _PAPER and ac2.move == _ROCK):
-            return True
-        return False
+        if self.move is None or ac2.move is None:
+            return False
+        return _ROUND_WINNER[self.move][ac2.move] == 1
 
     def __str__(self):
         if self.move == _ROCK:
@@ -254,59 +563,107 @@ class Action():
         return self.move
 
 
+for _move in (_ROCK, _SCISSOR, _PAPER):
+    _ACTIONS[_move] = Action(_move)
+
+
 class SingleGame():
     '''
-    Play a single game of RPS with two players
+    Play a single game of RPS with two players. If a <profiler> is given the
+    time spent in each phase of the game is recorded to it, see
+    profiling.RoundProfiler.
     '''
 
-    def __init__(self, p_1, p_2):
+    def __init__(self, p_1, p_2, profiler=None):
         self.p_1 = p_1
         self.p_2 = p_2
         self.p_1_move = None
         self.p_2_move = None
         self.winner = None
+        self.profiler = profiler
 
     def __str__(self):
         wname = self.winner.get_name() if self.winner else 'None'
-        return ('{}: '.format(self.p_1.get_name()) +
-                '{}'.format(str(self.p_1_move).ljust(12)) +
-                '{}: '.format(self.p_2.get_name()) +
-                '{}'.format(str(self.p_2_move).ljust(12)) +
-                '-> Winner: {}\n'.format(wname))
+        return '{}: {:<12}{}: {:<12}-> Winner: {}\n'.format(
+            self.p_1.get_name(), str(self.p_1_move),
+            self.p_2.get_name(), str(self.p_2_move), wname)
+
+    def winner_code(self):
+        ''' 0 if the game was a tie, 1 if player 1 won, 2 if player 2 won '''
+        if self.winner is None:
+            return 0
+        return 1 if self.winner is self.p_1 else 2
 
     def play(self):
         ''' Get each players move, find the winner and report back '''
+        if self.profiler is not None:
+            self.play_profiled()
+            return
+
         self.p_1_move = self.p_1.choose_action()
         self.p_2_move = self.p_2.choose_action()
-        self.winner = self.get_winner(self.p_1_move, self.p_2_move)
-
-        # Tie
-        if self.winner is None:
-            self.p_1.get_result(self.p_2_move, winner=None)
-            self.p_2.get_result(self.p_1_move, winner=None)
-
-        # Player 1 won
-        elif self.winner is self.p_1:
-            self.p_1.get_result(self.p_2_move, winner=1)
-            self.p_2.get_result(self.p_1_move, winner=0)
+        winner = _ROUND_WINNER[self.p_1_move.move][self.p_2_move.move]
+        self.winner = (None, self.p_1, self.p_2)[winner]
+        points_1, points_2 = _ROUND_POINTS[winner]
+        self.p_1.get_result(self.p_2_move, winner=points_1)
+        self.p_2.get_result(self.p_1_move, winner=points_2)
+
+    def play_profiled(self):
+        '''
+        Play like play(), timing each phase for each player. The timings are
+        recorded per player, so a style playing itself gets a row for each.
+        '''
+        clock = self.profiler.clock
+        name_1 = 'P1 ' + self.p_1.get_name()
+        name_2 = 'P2 ' + self.p_2.get_name()
+
+        start = clock()
+        self.p_1_move = self.p_1.choose_action()
+        middle = clock()
+        self.p_2_move = self.p_2.choose_action()
+        end = clock()
+        self.profiler.record(name_1, 'choose_action', middle - start)
+        self.profiler.record(name_2, 'choose_action', end - middle)
 
-        # Player 2 won
-        elif self.winner is self.p_2:
-            self.p_1.get_result(self.p_2_move, winner=0)
-            self.p_2.get_result(self.p_1_move, winner=1)
+        start = clock()
+        self.winner = self.get_winner(self.p_1_move, self.p_2_move)
+        end = clock()
+        self.profiler.record('SingleGame', 'get_winner', end - start)
+
+        start = clock()
+        self.p_1.get_result(self.p_2_move, winner=self.points(self.p_1))
+        middle = clock()
+        self.p_2.get_result(self.p_1_move, winner=self.points(self.p_2))
+        end = clock()
+        self.profiler.record(name_1, 'get_result', middle - start)
+        self.profiler.record(name_2, 'get_result', end - middle)
+
+    def points(self, player):
+        '''
+        Points for <player> to get_result: 1 for a win, 0 for a loss and None
+        for a tie
+        '''
+        return _ROUND_POINTS[self.winner_code()][player is self.p_2]
 
     def get_winner(self, player1_move, player2_move):
         ''' Return the winner, None if it is a tie '''
-        if player1_move == player2_move:
-            return None
-        if player1_move > player2_move:
-            return self.p_1
-        return self.p_2
+        winner = _ROUND_WINNER[player1_move.move][player2_move.move]
+        return (None, self.p_1, self.p_2)[winner]
 
 
 class MultipleGames():
     '''
-    Class to represent multiple games
+    Class to represent multiple games. If <out_file> is given every round is
+    written to it as it is played, see round_log.RoundWriter. If <plot_file>
+    is given the plot is saved there instead of shown.
+
+    If <checkpoint> is given, the players and the state of the random module
+    are saved there every <checkpoint_every> rounds of arrange_tournament.
+    With <resume> set, a tournament continues from the checkpoint if there is
+    one, and plays out exactly as if it had never stopped.
+
+    With <profile> set, each round is played one at a time with the time of
+    each phase recorded, and a summary is printed at the end.
     '''
 
     def __init__(self, p1=None, p_2=None, **kwargs):
@@ -315,24 +672,208 @@ class MultipleGames():
         self.num_games = kwargs.get('num_games', 100)
         self.print_games = kwargs.get('print_games', False)
         self.plot_games = kwargs.get('plot', False)
+        self.batch = kwargs.get('batch', True)
+        self.out_file = kwargs.get('out_file', None)
+        self.plot_file = kwargs.get('plot_file', None)
+        if self.plot_file is not None:
+            self.plot_games = True
+        self.checkpoint = kwargs.get('checkpoint', None)
+        self.checkpoint_every = kwargs.get('checkpoint_every', 1000000)
+        self.resume = kwargs.get('resume', False)
+        self.profiler = RoundProfiler() if kwargs.get('profile') else None
 
     def arrange_single_game(self):
         ''' Arrange a single game '''
-        game = SingleGame(self.p_1, self.p_2)
+        game = SingleGame(self.p_1, self.p_2, profiler=self.profiler)
         game.play()
         if self.print_games:
-            print(game)
+            if self.profiler is None:
+                print(game)
+            else:
+                start = self.profiler.clock()
+                print(game)
+                self.profiler.record('MultipleGames', 'print',
+                                     self.profiler.clock() - start)
+        return game
+
+    def can_batch(self):
+        ''' Check if the rounds can be played as a batch of arrays '''
+        return (self.batch and not self.print_games and
+                self.profiler is None and
+                self.p_1.player_style.batch_draws is not None and
+                self.p_2.player_style.batch_draws is not None)
+
+    def arrange_batch(self, num_rounds, writer=None):
+        '''
+        Play <num_rounds> rounds with the moves of both players precomputed as
+        arrays, writing the rounds to <writer> if given. The random draws are
+        taken in the same order as in arrange_single_game, so the result is
+        the same as playing the rounds one by one. Return the number of ties.
+        '''
+        style_1 = self.p_1.player_style
+        style_2 = self.p_2.player_style
+        draws_per_round = style_1.batch_draws + style_2.batch_draws
+        ties = 0
+
+        for start in range(0, num_rounds, _BATCH_CHUNK):
+            size = min(_BATCH_CHUNK, num_rounds - start)
+            draws = _randint_stream(size * draws_per_round)
+            draws = draws.reshape(size, draws_per_round)
+
+            moves_1 = style_1.make_moves(size, draws[:, :style_1.batch_draws])
+            moves_2 = style_2.make_moves(size, draws[:, style_1.batch_draws:])
+
+            winners = _WINNER[moves_1, moves_2]
+            ties += int(np.count_nonzero(winners == 0))
+            scores = np.cumsum(_OUTCOME[moves_1, moves_2]) + self.p_1.score
+            if writer is not None:
+                writer.write_rounds(moves_1, moves_2, winners, scores)
+
+            p_1_points = float(scores[-1]) - self.p_1.score
+            self.p_1.score += p_1_points
+            self.p_2.score += size - p_1_points
+
+        return ties
+
+    def play_rounds(self, num_rounds, writer=None):
+        '''
+        Play <num_rounds> rounds, as a batch if possible, writing the rounds
+        to <writer> if given. Return the number of ties.
+        '''
+        if self.can_batch():
+            return self.arrange_batch(num_rounds, writer)
+
+        ties = 0
+        for _ in range(num_rounds):
+            game = self.arrange_single_game()
+            if game.winner is None:
+                ties += 1
+            if writer is not None:
+                writer.write_round(int(game.p_1_move), int(game.p_2_move),
+                                   game.winner_code(), self.p_1.get_score())
+        return ties
 
     def arrange_tournament(self):
-        ''' Arrange a tournament with num_games rounds '''
-        averages = []
-        for i in range(1, self.num_games+1):
-            self.arrange_single_game()
-            curr_average = self.p_1.get_score() / i
-            averages += [curr_average]
+        '''
+        Arrange a tournament with num_games rounds, return the total score of
+        each player
+        '''
+        rounds, log_size = self.load_checkpoint()
+        writer, out_file = self.open_log(log_size)
+
+        while rounds < self.num_games:
+            size = self.num_games - rounds
+            if self.checkpoint is not None:
+                size = min(size, self.checkpoint_every)
+            self.play_rounds(size, writer)
+            rounds += size
+            if self.checkpoint is not None:
+                self.save_checkpoint(rounds, writer)
+
+        scores = self.finish_tournament(writer, out_file)
+        # No checkpoint is written if there were no rounds to play
+        if self.checkpoint is not None and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        return scores
+
+    def save_checkpoint(self, rounds, writer):
+        '''
+        Save the number of <rounds> played, the players, the state of the
+        random module and the size of the round log to the checkpoint file.
+        The file is replaced in one step, so a crash never leaves half a
+        checkpoint.
+        '''
+        state = {
+            'rounds': rounds,
+            'players': (self.p_1, self.p_2),
+            'random': random.getstate(),
+            'log_size': writer.size() if writer is not None else None
+        }
+        with open(self.checkpoint + '.tmp', 'wb') as checkpoint_file:
+            pickle.dump(state, checkpoint_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(self.checkpoint + '.tmp', self.checkpoint)
+
+    def load_checkpoint(self):
+        '''
+        Restore the players and the state of the random module from the
+        checkpoint file when resuming. Return the number of rounds already
+        played and the size of the round log, or 0 and None when starting
+        from scratch.
+        '''
+        if (not self.resume or self.checkpoint is None or
+                not os.path.exists(self.checkpoint)):
+            return 0, None
+
+        with open(self.checkpoint, 'rb') as checkpoint_file:
+            state = pickle.load(checkpoint_file)
+        self.p_1, self.p_2 = state['players']
+        random.setstate(state['random'])
+        return state['rounds'], state['log_size']
+
+    def arrange_until_confident(self, tolerance, confidence=0.95,
+                                batch_size=100):
+        '''
+        Play rounds in batches of <batch_size> until the <confidence>
+        interval of player 1's win rate is narrower than <tolerance>, or
+        num_games rounds have been played. A tie counts as half a win. Return
+        the number of rounds played, the win rate and half the width of the
+        interval, which are NaN and infinity if no rounds were played.
+        '''
+        z_score = NormalDist().inv_cdf((1 + confidence) / 2)
+        writer, out_file = self.open_log()
+
+        rounds = 0
+        ties = 0
+        win_rate = float('nan')
+        half_width = float('inf')
+        while rounds < self.num_games and 2 * half_width >= tolerance:
+            size = min(batch_size, self.num_games - rounds)
+            ties += self.play_rounds(size, writer)
+            rounds += size
+
+            # Each round scores 0, 0.5 or 1, so the sum of the squared scores
+            # is the number of wins plus a quarter of the ties
+            win_rate = self.p_1.get_score() / rounds
+            mean_square = (self.p_1.get_score() - ties / 4) / rounds
+            if rounds > 1:
+                variance = max(mean_square - win_rate ** 2, 0)
+                variance *= rounds / (rounds - 1)
+                half_width = z_score * math.sqrt(variance / rounds)
+
+        self.finish_tournament(writer, out_file)
+        return rounds, win_rate, half_width
+
+    def open_log(self, resume_size=None):
+        '''
+        Open the round log, if any, continuing it from <resume_size> bytes if
+        given. The plot is drawn from the round log, so a temporary one is
+        used when plotting without an out_file, next to the checkpoint if
+        there is one. Return the writer and the path of the log.
+        '''
+        out_file = self.out_file
+        if self.plot_games and out_file is None:
+            if self.checkpoint is not None:
+                out_file = self.checkpoint + '.rounds'
+            else:
+                handle, out_file = tempfile.mkstemp(suffix='.rounds')
+                os.close(handle)
+
+        if out_file is None:
+            return None, None
+        return RoundWriter(out_file, resume_size=resume_size), out_file
+
+    def finish_tournament(self, writer, out_file):
+        '''
+        Close the round log, plot and print the result, and reset the
+        players. Return the total score of each player.
+        '''
+        if writer is not None:
+            writer.close()
 
         if self.plot_games:
-            self.plot_game(averages)
+            self.plot_game(out_file)
+            if self.out_file is None:
+                os.remove(out_file)
 
         if self.print_games:
             print("Total points:")
@@ -340,19 +881,82 @@ class MultipleGames():
                                   self.p_1.score))
             print("{}: {}".format(self.p_2.get_name().rjust(25),
                                   self.p_2.score))
+        if self.profiler is not None:
+            print(self.profiler.summary())
+        scores = (self.p_1.get_score(), self.p_2.get_score())
         self.p_1.reset()
         self.p_2.reset()
+        return scores
+
+    def plot_game(self, log_file):
+        '''
+        Plot the game from the rounds written to <log_file>. The plot is
+        shown in a window, or saved to plot_file if it is set, in the format
+        given by its extension, e.g. .png or .svg.
+        '''
+        # matplotlib is slow to import, so only do it when plotting. Saved
+        # plots are drawn without a display
+        import matplotlib
+        if self.plot_file is not None:
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        fig, axes = plt.subplots()
+        axes.plot(*read_averages(log_file))
+        axes.set_title('{} vs. {}'.format(self.p_1.get_name(),
+                                          self.p_2.get_name()))
+        axes.set_xlabel('Game number')
+        axes.set_ylabel('Average score for {}'.format(self.p_1.get_name()))
+        axes.set_ylim((0, 1))
+        axes.axhline(y=0.5, linestyle='dotted', color='black')
+        axes.grid()
+
+        if self.plot_file is None:
+            plt.show()
+        else:
+            fig.savefig(self.plot_file)
+            plt.close(fig)
 
-    def plot_game(self, averages):
-        ''' Plot the game '''
-        plt.plot(list(range(self.num_games)), averages)
-        plt.title('{} vs. {}'.format(self.p_1.get_name(), self.p_2.get_name()))
-        plt.xlabel('Game number')
-        plt.ylabel('Average score for {}'.format(self.p_1.get_name()))
-        plt.ylim((0, 1))
-        plt.axhline(y=0.5, linestyle='dotted', color='black')
-        plt.grid()
-        plt.show()
+
+def _randint_stream(count):
+    '''
+    Return an array of the next <count> values random.randint(0, 2) would
+    give, and move the state of the random module past them. randint draws
+    the top two bits of a 32 bit Mersenne Twister output and retries on 3, so
+    the same numbers can be made in bulk from a copy of the generator.
+    '''
+    if count == 0:
+        return np.empty(0, dtype=np.int64)
+
+    version, internal_state, gauss_next = random.getstate()
+    bit_gen = np.random.MT19937()
+    mt_state = {
+        'bit_generator': 'MT19937',
+        'state': {
+            'key': np.array(internal_state[:-1], dtype=np.uint32),
+            'pos': internal_state[-1]
+        }
+    }
+    bit_gen.state = mt_state
+
+    # About one in four draws is rejected, so this rarely needs a second try
+    values = np.empty(0, dtype=np.uint64)
+    accepted = np.empty(0, dtype=np.int64)
+    while len(accepted) < count:
+        need = count - len(accepted)
+        values = np.concatenate(
+            (values, bit_gen.random_raw(need + need // 3 + 64) >> 30))
+        accepted = np.flatnonzero(values < 3)
+    used = int(accepted[count - 1]) + 1
+
+    # Replay exactly the draws used from the original state
+    bit_gen.state = mt_state
+    bit_gen.random_raw(used, output=False)
+    key = bit_gen.state['state']['key']
+    pos = bit_gen.state['state']['pos']
+    random.setstate((version, tuple(key.tolist()) + (pos,), gauss_next))
+
+    return values[accepted[:count]].astype(np.int64)
 
 
 def usage():
@@ -362,8 +966,25 @@ def usage():
     return '''Usage: python {0} [OPTS] "<P1>" "<P2>"
 Options:
         -n <num_games> :  Play <num_games> rounds. Defaults to 100
+        -w <window>    :  Hist and Freq only remember the opponents last
+                          <window> moves. Defaults to all moves
+        -r <file>      :  Write every round to <file>, as CSV if the name ends
+                          in .csv and as packed binary records otherwise
+        -c <tolerance> :  Play until the 95% confidence interval of P1's win
+                          rate is narrower than <tolerance>, at most
+                          <num_games> rounds
+        -k <file>      :  Save a checkpoint to <file> every 10^6 rounds
+        -e <rounds>    :  Save the checkpoint every <rounds> rounds instead
+        --resume       :  Continue from the checkpoint given with -k, if the
+                          run was stopped before it finished
         -p             :  Print each round
         -P             :  Plot P1's average score against P2
+        -o <file>      :  Save the plot to <file> instead of showing it, e.g.
+                          plot.png or plot.svg. Implies -P
+        -s             :  Play one round at a time, even when Rand, Seq and
+                          OTP could be played as a batch of arrays
+        -t             :  Time each phase of every round for each player,
+                          and print a summary at the end
         -h             :  Print help (this)
 
 If P1 and P2 are not supplied, P1 defaults to Hist(2), and P2 defaults to Seq.
@@ -374,6 +995,12 @@ P1 and P2 can be any of the following:
         Hist(<number>) :  Keep a history, search, optimize
         Freq           :  Counter opponents most frequent move
         OTP            :  One Trick Pony, choose one move, stick to it
+        Meta(<sizes>)  :  Follow whichever of Freq, Hist(<size>) for each of
+                          the comma separated <sizes> and a Seq detector has
+                          predicted the opponent best lately. Meta alone uses
+                          Hist(1), Hist(2) and Hist(3)
+        Pattern        :  Find the longest run of the opponents last moves
+                          seen before, counter the move that came after it
 
 For example, to simulate a 100 round tournament between Seq and Freq, both
 printed and plotted:
@@ -387,8 +1014,10 @@ def main():
     Play RPS
     """
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "n:pPh", [
-            "numgames=", "print", "plot", "help"
+        opts, args = getopt.getopt(sys.argv[1:], "n:w:r:c:o:k:e:pPsth", [
+            "numgames=", "window=", "rounds=", "confidence=", "output=",
+            "checkpoint=", "every=", "resume", "print", "plot", "scalar",
+            "timing", "help"
         ])
     except getopt.GetoptError as err:
         print(str(err))
@@ -398,33 +1027,79 @@ def main():
     ngames = 100
     printg = False
     plot = False
+    batch = True
+    window = None
+    rounds_file = None
+    tolerance = None
+    plot_file = None
+    checkpoint = None
+    checkpoint_every = 1000000
+    resume = False
+    profile = False
     for opt, arg in opts:
         if opt in ("-n", "--numgames"):
             ngames = int(arg)
+        elif opt in ("-w", "--window"):
+            if not arg.isdigit() or int(arg) < 1:
+                print('The window must be a positive number of moves')
+                print(usage())
+                sys.exit(2)
+            window = int(arg)
+        elif opt in ("-r", "--rounds"):
+            rounds_file = arg
+        elif opt in ("-c", "--confidence"):
+            tolerance = float(arg)
+        elif opt in ("-o", "--output"):
+            plot_file = arg
+        elif opt in ("-k", "--checkpoint"):
+            checkpoint = arg
+        elif opt in ("-e", "--every"):
+            checkpoint_every = int(arg)
+        elif opt == "--resume":
+            resume = True
         elif opt in ("-p", "--print"):
             printg = True
         elif opt in ("-P", "--plot"):
             plot = True
+        elif opt in ("-s", "--scalar"):
+            batch = False
+        elif opt in ("-t", "--timing"):
+            profile = True
         elif opt in ("-h", "--help"):
             print(usage())
             sys.exit(0)
 
     if len(args) == 2:
-        p1_pstyle, p1_hsize = ap.parse_args(args[0])
-        p2_pstyle, p2_hsize = ap.parse_args(args[1])
-
-        p_1 = Player(play_style=p1_pstyle, hist=p1_hsize)
-        p_2 = Player(play_style=p2_pstyle, hist=p2_hsize)
+        try:
+            p_1 = Player(play_style=args[0], window=window)
+            p_2 = Player(play_style=args[1], window=window)
+        except ValueError as err:
+            print(str(err))
+            print(usage())
+            sys.exit(2)
     else:
-        p_1 = Player(play_style=_HIST, hist=2)
+        p_1 = Player(play_style=_HIST, hist=2, window=window)
         p_2 = Player(play_style=_SEQ)
 
     games = MultipleGames(p_1, p_2,
                           num_games=ngames,
                           print_games=printg,
-                          plot=plot)
-
-    games.arrange_tournament()
+                          plot=plot,
+                          batch=batch,
+                          out_file=rounds_file,
+                          plot_file=plot_file,
+                          checkpoint=checkpoint,
+                          checkpoint_every=checkpoint_every,
+                          resume=resume,
+                          profile=profile)
+
+    if tolerance is None:
+        games.arrange_tournament()
+    else:
+        name = p_1.get_name()
+        rounds, win_rate, half_width = games.arrange_until_confident(tolerance)
+        print('{} won {:.4f} +- {:.4f} (95% confidence) after {} rounds'
+              .format(name, win_rate, half_width, rounds))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,88 @@
+'''
+Online suffix automaton over a stream of moves
+'''
+
+from array import array
+import sys
+
+
+class SuffixAutomaton():
+    '''
+    Suffix automaton of all the moves seen so far, built one move at a time
+    in amortized constant time per move. Each state stands for a set of
+    substrings that end at the same positions, and keeps the length of the
+    longest one, its suffix link and the position where it first ends.
+    Transitions are stored flat, <alphabet> per state, -1 for none.
+    '''
+
+    def __init__(self, alphabet=3):
+        self.alphabet = alphabet
+        self.reset()
+
+    def reset(self):
+        ''' Start over with only the root state '''
+        self.next = array('q', [-1] * self.alphabet)
+        self.link = array('q', [-1])
+        self.length = array('q', [0])
+        self.first_end = array('q', [-1])
+        self.moves = bytearray()
+        self.last = 0
+
+    def _add_state(self, length, link, first_end, transitions=None):
+        if transitions is None:
+            transitions = [-1] * self.alphabet
+        self.next.extend(transitions)
+        self.link.append(link)
+        self.length.append(length)
+        self.first_end.append(first_end)
+        return len(self.link) - 1
+
+    def add(self, move):
+        ''' Extend the automaton with <move> '''
+        alph = self.alphabet
+        pos = len(self.moves)
+        self.moves.append(move)
+
+        cur = self._add_state(self.length[self.last] + 1, -1, pos)
+        state = self.last
+        while state != -1 and self.next[state * alph + move] == -1:
+            self.next[state * alph + move] = cur
+            state = self.link[state]
+
+        if state == -1:
+            self.link[cur] = 0
+        else:
+            other = self.next[state * alph + move]
+            if self.length[state] + 1 == self.length[other]:
+                self.link[cur] = other
+            else:
+                # Split <other> so the state for the shorter substrings can
+                # be shared with <cur>
+                clone = self._add_state(
+                    self.length[state] + 1, self.link[other],
+                    self.first_end[other],
+                    self.next[other * alph:(other + 1) * alph])
+                while (state != -1 and
+                       self.next[state * alph + move] == other):
+                    self.next[state * alph + move] = clone
+                    state = self.link[state]
+                self.link[other] = clone
+                self.link[cur] = clone
+
+        self.last = cur
+
+    def longest_match(self):
+        '''
+        Find the longest suffix of the moves that also occurred earlier.
+        Return its length and the position where its first occurrence ends,
+        or (0, -1) if not even the last move has been seen before.
+        '''
+        if self.last == 0:
+            return 0, -1
+        state = self.link[self.last]
+        return self.length[state], self.first_end[state]
+
+    def memory_usage(self):
+        ''' Number of bytes used by the automaton and the moves '''
+        return sum(sys.getsizeof(part) for part in (
+            self.next, self.link, self.length, self.first_end, self.moves))
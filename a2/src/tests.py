@@ -0,0 +1,141 @@
+import os
+import random
+import tempfile
+import rps
+
+
+def scan_prediction(opp_hist, hist_size):
+    '''
+    The move the original History predicted, by searching the whole history
+    for the <hist_size> last moves every time
+    '''
+    if len(opp_hist) < hist_size + 1:
+        return None
+    last_moves = opp_hist[-hist_size:]
+    move_count = [0, 0, 0]
+    for i in range(len(opp_hist) - hist_size - 1):
+        if opp_hist[i:i+hist_size] == last_moves:
+            move_count[opp_hist[i+hist_size]] += 1
+    return move_count.index(max(move_count))
+
+
+def test_batch(num_games=1000):
+    styles = ['Rand', 'Seq', 'OTP']
+    for style_1 in styles:
+        for style_2 in styles:
+            results = []
+            for batch in (True, False):
+                random.seed(42)
+                games = rps.MultipleGames(rps.Player(style_1),
+                                          rps.Player(style_2),
+                                          num_games=num_games, batch=batch)
+                scores = games.arrange_tournament()
+                results.append((scores, random.getstate()))
+            assert results[0] == results[1], \
+                f'Batch of {style_1} vs {style_2} differs from one by one'
+
+
+def test_history(num_moves=400):
+    for hist_size in range(5):
+        for window in (None, 5, 30):
+            random.seed(hist_size)
+            style = rps.History(hist_size=hist_size, max_window=window)
+            opp_hist = []
+            for i in range(num_moves):
+                # Mix random moves with runs of a repeating pattern
+                move = random.randint(0, 2) if i % 50 < 25 else i % 3
+                seen = opp_hist if window is None else opp_hist[-window:]
+                assert style.predict() == scan_prediction(seen, hist_size), \
+                    f'Hist({hist_size}) with window {window} fail at {i}'
+                style.add_opp_move(move)
+                opp_hist.append(move)
+
+
+class Interrupted(Exception):
+    ''' Stands in for a run being killed '''
+
+
+def run_checkpointed(style_1, style_2, log_file, checkpoint, resume=False,
+                     stop_after=None):
+    '''
+    Play 5000 rounds with a checkpoint every 700 rounds, stopping with
+    Interrupted instead of saving checkpoint number <stop_after> + 1
+    '''
+    games = rps.MultipleGames(rps.Player(style_1), rps.Player(style_2),
+                              num_games=5000, out_file=log_file,
+                              checkpoint=checkpoint, checkpoint_every=700,
+                              resume=resume)
+    if stop_after is not None:
+        save = games.save_checkpoint
+        saved = []
+
+        def save_or_stop(rounds, writer):
+            if len(saved) == stop_after:
+                raise Interrupted
+            saved.append(rounds)
+            save(rounds, writer)
+        games.save_checkpoint = save_or_stop
+    return games.arrange_tournament()
+
+
+def test_resume():
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = os.path.join(tmp, 'checkpoint')
+        for style_1, style_2 in [('Rand', 'OTP'), ('Rand', 'Hist(2)')]:
+            for log_name in ('rounds.bin', 'rounds.csv'):
+                log_file = os.path.join(tmp, log_name)
+                results = []
+                for interrupt in (False, True):
+                    random.seed(7)
+                    if interrupt:
+                        try:
+                            run_checkpointed(style_1, style_2, log_file,
+                                             checkpoint, stop_after=3)
+                        except Interrupted:
+                            pass
+                        # Resuming must not depend on the state at the stop
+                        random.seed(8)
+                    scores = run_checkpointed(style_1, style_2, log_file,
+                                              checkpoint, resume=interrupt)
+                    with open(log_file, 'rb') as log:
+                        results.append((scores, random.getstate(),
+                                        log.read()))
+                assert results[0] == results[1], \
+                    f'Resumed {style_1} vs {style_2} ({log_name}) differs'
+                assert not os.path.exists(checkpoint), 'Checkpoint left'
+
+
+def test_pattern(num_moves=400):
+    for seed in range(3):
+        random.seed(seed)
+        automaton = rps.SuffixAutomaton()
+        moves = []
+        for i in range(num_moves):
+            move = random.randint(0, 2) if i % 60 < 20 else (i // 2) % 3
+            automaton.add(move)
+            moves.append(move)
+
+            # The longest suffix of the moves that also ends earlier
+            expected = (0, None)
+            for end in range(len(moves) - 1):
+                length = 0
+                while (length <= end and
+                       moves[end - length] == moves[-1 - length]):
+                    length += 1
+                if length > expected[0]:
+                    expected = (length, end)
+            length, end = automaton.longest_match()
+            assert length == expected[0], f'Match length wrong at move {i}'
+            if length > 0:
+                assert end == expected[1], f'Match end wrong at move {i}'
+
+
+def main():
+    test_batch()
+    test_history()
+    test_resume()
+    test_pattern()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+'''
+Encode or decode a file with one of the classical cyphers, a chunk at a time,
+so files of any size are done in constant memory
+'''
+
+import getopt
+import sys
+import crypto as c
+
+
+def parse_key(cypher_name: str, key: str):
+    '''
+    Parse <key> for the cypher <cypher_name>: a number for Caesar and
+    Multiplication, two numbers 'n,m' for Affine and a word for Unbreakable
+    '''
+    if cypher_name == 'unbreakable':
+        if not key:
+            raise ValueError('the key can not be empty')
+        return key
+    if cypher_name == 'affine':
+        parts = key.split(',')
+        if len(parts) != 2:
+            raise ValueError('the Affine key must be of the form n,m')
+        return (int(parts[0]), int(parts[1]))
+    return int(key)
+
+
+def usage():
+    ''' Print usage '''
+    print(f'''Usage: python crypt_file.py [options] <cypher> <key> <in> <out>
+Encode <in> into <out> with <cypher>, one of {', '.join(c.CYPHERS)}.
+Use - as <in> or <out> for stdin or stdout.
+Options:
+    -d, --decode         Decode instead of encode
+    -b, --block [n]      Bytes to read at a time (default {c.CHUNK_SIZE})
+    -h, --help           Show this help message''')
+
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'db:h',
+                                   ['decode', 'block=', 'help'])
+    except getopt.GetoptError as err:
+        print(err)
+        usage()
+        sys.exit(2)
+
+    decode = False
+    chunk_size = c.CHUNK_SIZE
+    try:
+        for opt, arg in opts:
+            if opt in ('-h', '--help'):
+                usage()
+                sys.exit()
+            elif opt in ('-d', '--decode'):
+                decode = True
+            elif opt in ('-b', '--block'):
+                chunk_size = int(arg)
+                if chunk_size < 1:
+                    raise ValueError('the block size must be positive')
+
+        if len(args) != 4:
+            usage()
+            sys.exit(2)
+        cypher_name, key, in_name, out_name = args
+        cypher_name = cypher_name.lower()
+        if cypher_name not in c.CYPHERS:
+            raise ValueError(f'unknown cypher "{cypher_name}"')
+        key = parse_key(cypher_name, key)
+    except ValueError as err:
+        print(f'Invalid argument: {err}')
+        usage()
+        sys.exit(2)
+
+    cypher = c.CYPHERS[cypher_name]()
+    in_file = sys.stdin.buffer if in_name == '-' else open(in_name, 'rb')
+    out_file = sys.stdout.buffer if out_name == '-' else open(out_name, 'wb')
+    try:
+        c.operate_file(cypher, key, in_file, out_file, decode=decode,
+                       chunk_size=chunk_size)
+    finally:
+        if in_file is not sys.stdin.buffer:
+            in_file.close()
+        if out_file is not sys.stdout.buffer:
+            out_file.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,12 +2,62 @@
 Simulation of cryptographic encoding and decoding of strings
 '''
 
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+import functools
+import itertools
+import os
 import random
+import numpy as np
 import crypto_utils as cu
+import frequency as fa
+import word_index as wi
 
 FIRST = 97
 ALPHLEN = 26
 
+# Bytes read at a time when a file is encoded or decoded as a stream
+CHUNK_SIZE = 1 << 20
+
+
+def text_to_codes(text: str) -> np.ndarray:
+    '''
+    Translate <text> to an array of indexes in our alphabet, the same way the
+    cyphers do with (ord(c) - FIRST) % ALPHLEN for each char
+    '''
+    ords = np.frombuffer(text.encode('utf_32_le'), dtype='<u4')
+    return ((ords.astype(np.int64) - FIRST) % ALPHLEN).astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=256)
+def _translation_table(mult: int, shift: int) -> bytes:
+    '''
+    Table for bytes.translate that maps each byte b to the char with index
+    ((b - FIRST) * mult + shift) % ALPHLEN in our alphabet
+    '''
+    return bytes(FIRST + ((b - FIRST) * mult + shift) % ALPHLEN
+                 for b in range(256))
+
+
+@functools.lru_cache(maxsize=None)
+def _modular_inverse(key: int):
+    ''' cu.modular_inverse(key, ALPHLEN), computed once per key '''
+    return cu.modular_inverse(key, ALPHLEN)
+
+
+def codes_to_texts(codes: np.ndarray) -> [str]:
+    '''
+    Translate an array of indexes in our alphabet to text, one string per row
+    of the last axis
+    '''
+    length = codes.shape[-1]
+    if length == 0:
+        return [''] * int(np.prod(codes.shape[:-1]))
+    chars = (codes.reshape(-1, length) + FIRST).astype(np.uint8).tobytes()
+    flat = chars.decode('ascii')
+    return [flat[i:i+length] for i in range(0, len(flat), length)]
+
 
 class Cypher():
     '''
@@ -26,6 +76,17 @@ class Cypher():
     def encode(self, text: str, key) -> str:
         ''' Encode <text> using <key> '''
 
+    def candidate_keys(self) -> list:
+        '''
+        All the keys a brute force attack tries. The cyphers that have any
+        also implement decode_batch(codes, keys), which decodes the texts in
+        <codes>, given as indexes in our alphabet (see text_to_codes), with
+        every key in <keys> at once. <codes> can hold one text or a 2-D array
+        of texts of the same length, and the result gets an axis for the keys
+        before the last axis.
+        '''
+        return []
+
     def verify(self, clear_text: str, key) -> bool:
         '''
         Verify that the encryption and then decryption of <text> using <key>
@@ -33,6 +94,31 @@ class Cypher():
         '''
         return self.decode(self.encode(clear_text, key), key) == clear_text
 
+    def key_at(self, key, offset: int):
+        '''
+        The key to use for text that starts <offset> chars into a stream. The
+        cyphers that treat every char the same way use the same key everywhere
+        '''
+        return key
+
+    def encode_stream(self, chunks, key):
+        '''
+        Encode an iterable of bytes, one char per byte, and yield the encoded
+        chunks as bytes. Only one chunk is held in memory at a time.
+        '''
+        return self._operate_stream(chunks, key, self.encode)
+
+    def decode_stream(self, chunks, key):
+        ''' Decode an iterable of bytes, see encode_stream '''
+        return self._operate_stream(chunks, key, self.decode)
+
+    def _operate_stream(self, chunks, key, operation):
+        offset = 0
+        for chunk in chunks:
+            text = chunk.decode('latin_1')
+            yield operation(text, self.key_at(key, offset)).encode('latin_1')
+            offset += len(text)
+
     def translate_to_text(self, ord_list: [int]) -> str:
         '''
         Translate a list of numbers to characters. FIRST is the ordinal of the
@@ -40,6 +126,22 @@ class Cypher():
         '''
         return ''.join([chr(FIRST + i) for i in ord_list])
 
+    def translate_affine(self, text: str, mult: int, shift: int) -> str:
+        '''
+        Replace each char c in <text> with the char with index
+        ((ord(c) - FIRST) * mult + shift) % ALPHLEN in our alphabet. Text that
+        fits in one byte per char is done with a single bytes.translate call
+        on a cached table, anything else one char at a time.
+        '''
+        mult %= ALPHLEN
+        shift %= ALPHLEN
+        try:
+            data = text.encode('latin_1')
+        except UnicodeEncodeError:
+            return self.translate_to_text(
+                [((ord(c) - FIRST) * mult + shift) % ALPHLEN for c in text])
+        return data.translate(_translation_table(mult, shift)).decode('ascii')
+
 
 class Caesar(Cypher):
     '''
@@ -59,8 +161,14 @@ class Caesar(Cypher):
         (ord(c) - FIRST), then add <key> and wrap around by using the mod
         of the length of the alphabet (<ALPHLEN>).
         '''
-        enc = [(ord(c) - FIRST + key) % ALPHLEN for c in text]
-        return self.translate_to_text(enc)
+        return self.translate_affine(text, 1, key)
+
+    def candidate_keys(self) -> list:
+        return list(range(ALPHLEN))
+
+    def decode_batch(self, codes: np.ndarray, keys: list) -> np.ndarray:
+        shifts = np.array(keys, dtype=np.int64)[:, None]
+        return ((codes[..., None, :] - shifts) % ALPHLEN).astype(np.uint8)
 
 
 class Multiplication(Cypher):
@@ -73,10 +181,9 @@ class Multiplication(Cypher):
         For each char in <text>, find it's index in our alphabet
         (ord(c) - FIRST), then multiply the modular inverse of the key
         and wrap around using mod of the length of tha alphabet (<ALPHLEN>).
+        A key without an inverse decodes every char to index 0.
         '''
-        dec = [((ord(c) - FIRST) * cu.modular_inverse(key, ALPHLEN)) % ALPHLEN
-               for c in text]
-        return self.translate_to_text(dec)
+        return self.translate_affine(text, _modular_inverse(key), 0)
 
     def encode(self, text: str, key: int) -> str:
         '''
@@ -84,8 +191,19 @@ class Multiplication(Cypher):
         (ord(c) - FIRST), then multiply by <key> and wrap around using the
         mod of the length of the alphabet (<ALPHLEN>).
         '''
-        enc = [((ord(c) - FIRST) * key) % ALPHLEN for c in text]
-        return self.translate_to_text(enc)
+        return self.translate_affine(text, key, 0)
+
+    def candidate_keys(self) -> list:
+        return list(range(ALPHLEN))
+
+    def decode_batch(self, codes: np.ndarray, keys: list) -> np.ndarray:
+        '''
+        Keys without an inverse decode every char to index 0, just like
+        decode does
+        '''
+        inverses = np.array([cu.modular_inverse(key, ALPHLEN) or 0
+                             for key in keys], dtype=np.int64)[:, None]
+        return ((codes[..., None, :] * inverses) % ALPHLEN).astype(np.uint8)
 
 
 class Affine(Cypher):
@@ -103,20 +221,29 @@ class Affine(Cypher):
         <key> is a tuple (n, m) where n is the key for the
         Multiplication-cypher, and m is is the key for the Caesar-cypher.
         First decode the Caesar-cypher using n, then decode the result of that
-        with the Multiplication-cypher using m
+        with the Multiplication-cypher using m. Both steps are done at once:
+        (x - m) * n^-1 = x * n^-1 - m * n^-1
         '''
-        c_dec = self.caesar.decode(text, key[1])
-        decoded = self.multi.decode(c_dec, key[0])
-        return decoded
+        inverse = _modular_inverse(key[0])
+        return self.translate_affine(text, inverse, -key[1] * inverse)
 
     def encode(self, text: str, key: tuple) -> str:
         '''
         <key> is a tuple (n, m) where n is the key for the
         Multiplication-cypher, and m is is the key for the Caesar-cypher.
+        Both steps are done at once, as x * n + m.
         '''
-        multi_enc = self.multi.encode(text, key[0])
-        encoded = self.caesar.encode(multi_enc, key[1])
-        return encoded
+        return self.translate_affine(text, key[0], key[1])
+
+    def candidate_keys(self) -> list:
+        return [(i, j) for i in range(ALPHLEN) for j in range(ALPHLEN)]
+
+    def decode_batch(self, codes: np.ndarray, keys: list) -> np.ndarray:
+        shifts = np.array([key[1] for key in keys], dtype=np.int64)[:, None]
+        inverses = np.array([cu.modular_inverse(key[0], ALPHLEN) or 0
+                             for key in keys], dtype=np.int64)[:, None]
+        return (((codes[..., None, :] - shifts) * inverses) % ALPHLEN).astype(
+            np.uint8)
 
 
 class Unbreakable(Cypher):
@@ -152,24 +279,128 @@ class Unbreakable(Cypher):
 
         return self.translate_to_text(enc)
 
+    def key_at(self, key: str, offset: int) -> str:
+        '''
+        The key repeats over the whole stream, so a chunk that starts
+        <offset> chars in starts that far into the key
+        '''
+        offset %= len(key)
+        return key[offset:] + key[:offset]
+
+
+# An RSA private key. n and d come first, so it can be used anywhere a plain
+# (n, d) tuple can, and the rest are kept for decoding with the Chinese
+# Remainder Theorem: d_p = d mod (p - 1), d_q = d mod (q - 1) and q_inv is the
+# inverse of q mod p.
+PrivateKey = namedtuple('PrivateKey', ['n', 'd', 'p', 'q', 'd_p', 'd_q',
+                                       'q_inv'])
+
 
 class RSA(Cypher):
     '''
-    Encrypt/decrypt using RSA
+    Encrypt/decrypt using RSA. The UTF-8 bytes of the text are prefixed with
+    their count and padded with zeros, and then packed into blocks of as many
+    bytes as the modulus allows, so each block takes one pow.
     '''
 
+    # Bytes used for the length prefix
+    LENGTH_BYTES = 8
+
+    @staticmethod
+    def block_size(n: int) -> int:
+        ''' The most bytes per block that always give a number below <n> '''
+        size = (n.bit_length() - 1) // 8
+        if size < 1:
+            raise ValueError(f'The modulus {n} is too small for a block')
+        return size
+
+    def blocks_from_text(self, text: str, n: int) -> [int]:
+        ''' Pack <text> into blocks for the modulus <n> '''
+        size = self.block_size(n)
+        data = text.encode('utf_8')
+        data = len(data).to_bytes(self.LENGTH_BYTES, 'big') + data
+        data += bytes(-len(data) % size)
+        view = memoryview(data)
+        return [int.from_bytes(view[i:i + size], 'big')
+                for i in range(0, len(data), size)]
+
+    def text_from_blocks(self, blocks: [int], n: int) -> str:
+        ''' Unpack the text in <blocks>, see blocks_from_text '''
+        size = self.block_size(n)
+        data = b''.join(block.to_bytes(size, 'big') for block in blocks)
+        length = int.from_bytes(data[:self.LENGTH_BYTES], 'big')
+        return data[self.LENGTH_BYTES:self.LENGTH_BYTES + length].decode(
+            'utf_8')
+
+    def decode_blocks(self, blocks: [int], key) -> [int]:
+        '''
+        Decode every block in <blocks>. A PrivateKey decodes modulo p and q
+        with the smaller exponents d_p and d_q and combines the two with the
+        Chinese Remainder Theorem, which is 3-4 times faster than pow with d
+        modulo n. A plain (n, d) tuple does the full pow.
+        '''
+        if not isinstance(key, PrivateKey):
+            n, d = key[0], key[1]
+            return [pow(c, d, n) for c in blocks]
+
+        p, q, d_p, d_q, q_inv = key.p, key.q, key.d_p, key.d_q, key.q_inv
+        decoded = []
+        for c in blocks:
+            m_q = pow(c, d_q, q)
+            decoded.append(m_q + (q_inv * (pow(c, d_p, p) - m_q) % p) * q)
+        return decoded
+
+    def encode_blocks(self, blocks: [int], key) -> [int]:
+        ''' Encode every block in <blocks> with the public key (n, e) '''
+        n, e = key[0], key[1]
+        return [pow(b, e, n) for b in blocks]
+
     def decode(self, text, key):
-        n = key[0]
-        d = key[1]
-        dec_blocks = [pow(c, d, n) for c in text]
-        return cu.text_from_blocks(dec_blocks, 1)
+        return self.text_from_blocks(self.decode_blocks(text, key), key[0])
 
     def encode(self, text, key):
-        t = cu.blocks_from_text(text, 1)
-        n = key[0]
-        e = key[1]
-        enc_blocks = [pow(b, e, n) for b in t]
-        return enc_blocks
+        return self.encode_blocks(self.blocks_from_text(text, key[0]), key)
+
+    def encode_stream(self, chunks, key):
+        '''
+        RSA encodes to a list of blocks, not to text, so it can not be
+        streamed like the classical cyphers
+        '''
+        raise TypeError('RSA does not support encode_stream, use encode_bulk')
+
+    def decode_stream(self, chunks, key):
+        ''' See encode_stream '''
+        raise TypeError('RSA does not support decode_stream, use decode_bulk')
+
+    def decode_bulk(self, text, key, workers=None) -> str:
+        ''' Decode like decode, with the blocks spread over processes '''
+        blocks = rsa_bulk(text, key, decode=True, workers=workers)
+        return self.text_from_blocks(blocks, key[0])
+
+    def encode_bulk(self, text, key, workers=None) -> [int]:
+        ''' Encode like encode, with the blocks spread over processes '''
+        return rsa_bulk(self.blocks_from_text(text, key[0]), key,
+                        workers=workers)
+
+
+def read_chunks(file, chunk_size: int = CHUNK_SIZE):
+    ''' Iterate over the bytes in the binary <file>, <chunk_size> at a time '''
+    return iter(lambda: file.read(chunk_size), b'')
+
+
+def operate_file(cypher: Cypher, key, in_file, out_file, decode=False,
+                 chunk_size: int = CHUNK_SIZE) -> int:
+    '''
+    Encode, or decode if <decode> is set, the binary file object <in_file>
+    into <out_file> with <cypher> and <key>, <chunk_size> bytes at a time.
+    Returns the number of bytes written.
+    '''
+    operate = cypher.decode_stream if decode else cypher.encode_stream
+    written = 0
+    for chunk in operate(read_chunks(in_file, chunk_size), key):
+        out_file.write(chunk)
+        written += len(chunk)
+    return written
 
 
 class Person():
@@ -212,7 +443,8 @@ class Reciever(Person):
 
     def generate_keys(self, bits=128):
         '''
-        Generate an RSA-key
+        Generate an RSA-key. The private key is kept as a PrivateKey, and the
+        public key (n, e) is returned.
         '''
         p = cu.generate_random_prime(bits)
         q = cu.generate_random_prime(bits)
@@ -227,54 +459,355 @@ class Reciever(Person):
             e = random.randint(3, phi-1)
             d = cu.modular_inverse(e, phi)
 
-        self.key = (n, d)
+        self.key = PrivateKey(n, d, p, q, d % (p - 1), d % (q - 1),
+                              cu.modular_inverse(q, p))
         return (n, e)
 
 
 class Hacker(Reciever):
     '''
-    Class for hacking of a cypher
+    Class for hacking of a cypher. If <index_file> is given the words are
+    looked up in that prebuilt index (see word_index.build_index) instead of
+    being loaded into a set.
     '''
 
-    def __init__(self, cypher):
+    def __init__(self, cypher, index_file=None):
         super().__init__(cypher)
+        self.index_file = index_file
         self.words = None
 
     def load_words(self, f='src/english_words.txt'):
         '''
-        Load words from a file containing one word per line.
+        Load words from a file containing one word per line. The words are
+        only read once per process and shared by all Hackers.
         '''
-        with open(f, 'r') as word_file:
-            self.words = {line.rstrip('\n') for line in word_file}
+        if self.index_file is not None:
+            self.words = wi.open_index(self.index_file)
+        else:
+            self.words = wi.load_words(f)
 
     def operate_cypher(self, text: str) -> set[str]:
         '''
         Bruteforce decode cypher
         '''
-        self.load_words()
-        matches = set()
+        if self.words is None:
+            self.load_words()
 
-        def check_match(decode, matches=matches, words=self.words):
-            if decode in words:
-                matches.add(decode)
+        # Caesar/Multiplication/Affine: decode with all the keys at once
+        if isinstance(self.cypher, (Caesar, Multiplication, Affine)):
+            return self.operate_cypher_batch([text])[0]
 
-        # Caesar/Multiplication
-        if isinstance(self.cypher, (Caesar, Multiplication)):
-            for i in range(ALPHLEN):
-                check_match(self.cypher.decode(text, i))
+        # Unbreakable: only try the keys that can give a word
+        if isinstance(self.cypher, Unbreakable):
+            return unbreakable_index(self.words).crack(text)
 
-        # Affine
-        if isinstance(self.cypher, Affine):
-            for i in range(ALPHLEN):
-                for j in range(ALPHLEN):
-                    check_match(self.cypher.decode(text, (i, j)))
+        if isinstance(self.cypher, RSA):
+            print('Good luck!')
 
-        # Unbreakable
-        if isinstance(self.cypher, Unbreakable):
-            for word in self.words:
-                check_match(self.cypher.decode(text, word))
+        return set()
 
+    def operate_cypher_batch(self, texts: [str]) -> [set[str]]:
+        '''
+        Bruteforce decode many cyphers of the Caesar, Multiplication or
+        Affine type. Texts of the same length are translated to one array and
+        decoded with every key in a single operation, and only the decoded
+        candidates are looked up in the dictionary.
+        '''
+        if self.words is None:
+            self.load_words()
+        keys = self.cypher.candidate_keys()
+        results = [set() for _ in texts]
+
+        by_length = {}
+        for i, text in enumerate(texts):
+            by_length.setdefault(len(text), []).append(i)
+
+        for length, indexes in by_length.items():
+            if length == 0:
+                codes = np.zeros((len(indexes), 0), dtype=np.uint8)
+            else:
+                codes = text_to_codes(''.join(texts[i] for i in indexes))
+                codes = codes.reshape(len(indexes), length)
+            decoded = self.cypher.decode_batch(codes, keys)
+            candidates = codes_to_texts(decoded)
+            for row, i in enumerate(indexes):
+                words = candidates[row * len(keys):(row + 1) * len(keys)]
+                results[i] = {word for word in words if word in self.words}
+
+        return results
+
+    def crack_frequency(self, text: str, top: int = 5,
+                        max_key_length: int = 20) -> list:
+        '''
+        Crack a cypher of any length, also of many words run together, by
+        frequency analysis instead of trying every key on the dictionary.
+        The letter and pair histograms of <text> are counted once, and every
+        key is scored by how English its decoded histograms are. For
+        Unbreakable the key length is estimated from the index of
+        coincidence, and each letter of the key is then found on its own.
+        Only the <top> best keys are decoded and split into dictionary words.
+        Returns them as Candidates, the ones that split into words first,
+        each group from the most to the least English.
+        '''
+        if self.words is None:
+            self.load_words()
         if isinstance(self.cypher, RSA):
             print('Good luck!')
+            return []
+
+        codes = text_to_codes(text)
+        bigrams = fa.bigram_log_probs(self.words)
+        if isinstance(self.cypher, Unbreakable):
+            lengths = fa.rank_key_lengths(codes, max_key_length)[:top]
+            keys = [self.cypher.translate_to_text(fa.refine_shifts(
+                codes, fa.best_shifts(codes, m), bigrams)) for m in lengths]
+            scores = [fa.score_codes(text_to_codes(self.cypher.decode(
+                text, key)), bigrams) for key in keys]
+        else:
+            keys = self.cypher.candidate_keys()
+            tables = self.cypher.decode_batch(
+                np.arange(ALPHLEN, dtype=np.uint8), keys)
+            # Keys without an inverse lose letters and can not be right
+            invertible = np.all(np.sort(tables, axis=1) == np.arange(ALPHLEN),
+                                axis=1)
+            keys = [key for key, ok in zip(keys, invertible) if ok]
+            scores = fa.score_tables(tables[invertible].astype(np.int64),
+                                     fa.histogram(codes),
+                                     fa.bigram_histogram(codes), bigrams)
+
+        # On a tie the key ranked first wins, like the shortest key length
+        best = sorted(range(len(keys)), key=lambda i: (-scores[i], i))[:top]
+        candidates = []
+        seen = set()
+        for i in best:
+            score = scores[i]
+            decoded = self.cypher.decode(text, keys[i])
+            # A repeated key, like 'keykey' for 'key', gives the same text
+            if decoded in seen:
+                continue
+            seen.add(decoded)
+            words = fa.segment_words(decoded, self.words)
+            candidates.append(Candidate(keys[i], decoded, float(score), words))
+        candidates.sort(key=lambda candidate: candidate.words is None)
+        return candidates
+
+
+Candidate = namedtuple('Candidate', ['key', 'text', 'score', 'words'])
+
+
+class UnbreakableIndex():
+    '''
+    Index of <words> for finding the dictionary words that decode an
+    Unbreakable cypher with a dictionary word as the key, without decoding
+    with every word.
+
+    Decoding text c with key k gives p = c - k (mod ALPHLEN), repeating k as
+    needed. So instead of trying keys, every word p of the same length as c
+    is tried as the plain text at once, as an array, and the key c - p it
+    would need is checked. A key at least as long as c only has its first
+    len(c) letters used, so those prefixes are kept in a set per length. A
+    shorter key of length m repeats, so c - p must repeat with period m, which
+    rules out almost every p with one comparison of the array with itself
+    shifted by m. Only the few that are left are looked up among the keys of
+    length m.
+    '''
+
+    def __init__(self, words):
+        by_length = {}
+        for word in words:
+            by_length.setdefault(len(word), []).append(word)
+
+        # Keys as the bytes of their alphabet indexes, by length
+        self.keys = {}
+        # Words that a decode can give, i.e. only a-z, as arrays by length
+        self.plain_texts = {}
+        self.plain_codes = {}
+        for length, group in by_length.items():
+            if length == 0:
+                self.keys[0] = {b''}
+                self.plain_texts[0] = ['']
+                continue
+            codes = text_to_codes(''.join(group)).reshape(len(group), length)
+            rows = codes.tobytes()
+            self.keys[length] = {rows[i:i + length]
+                                 for i in range(0, len(rows), length)}
+
+            plain = [word for word in group
+                     if word.isascii() and word.isalpha() and word.islower()]
+            self.plain_texts[length] = plain
+            self.plain_codes[length] = text_to_codes(''.join(plain)).reshape(
+                len(plain), length)
+
+        self.max_key_length = max(self.keys, default=0)
+        self._prefixes = {}
+
+    def key_prefixes(self, length: int) -> set:
+        ''' The first <length> letters of every key at least that long '''
+        if length not in self._prefixes:
+            self._prefixes[length] = {
+                key[:length]
+                for key_length in range(length, self.max_key_length + 1)
+                for key in self.keys.get(key_length, ())}
+        return self._prefixes[length]
+
+    def crack(self, text: str) -> set[str]:
+        ''' Find all the words <text> decodes to with a word as the key '''
+        length = len(text)
+        if length == 0:
+            # Any key decodes the empty text to itself
+            return set(self.plain_texts.get(0, [])) if self.keys else set()
+        if length not in self.plain_codes:
+            return set()
+
+        plain = self.plain_codes[length]
+        needed_keys = (text_to_codes(text)[None, :].astype(np.int16) -
+                       plain) % ALPHLEN
+        needed_keys = needed_keys.astype(np.uint8)
+        rows = needed_keys.tobytes()
+        texts = self.plain_texts[length]
+
+        prefixes = self.key_prefixes(length)
+        matches = {texts[i] for i in range(len(texts))
+                   if rows[i * length:(i + 1) * length] in prefixes}
+
+        for key_length in range(1, length):
+            keys = self.keys.get(key_length)
+            if not keys:
+                continue
+            periodic = np.all(needed_keys[:, key_length:] ==
+                              needed_keys[:, :-key_length], axis=1)
+            for i in np.flatnonzero(periodic):
+                if needed_keys[i, :key_length].tobytes() in keys:
+                    matches.add(texts[i])
 
         return matches
+
+
+@functools.lru_cache(maxsize=4)
+def unbreakable_index(words) -> UnbreakableIndex:
+    ''' The UnbreakableIndex of <words>, built once per set of words '''
+    return UnbreakableIndex(words)
+
+
+# Cyphers a crack job can name
+CYPHERS = {
+    'caesar': Caesar,
+    'multiplication': Multiplication,
+    'affine': Affine,
+    'unbreakable': Unbreakable
+}
+
+CrackResult = namedtuple('CrackResult',
+                         ['index', 'cypher_type', 'text', 'matches',
+                          'seconds'])
+
+# The Hackers of a worker process, one per cypher class
+_WORKER_HACKERS = {}
+
+
+def _init_worker(words_file, index_file):
+    ''' Load the words once when a worker process starts '''
+    for cypher_class in CYPHERS.values():
+        hacker = Hacker(cypher_class(), index_file=index_file)
+        hacker.load_words(words_file)
+        _WORKER_HACKERS[cypher_class] = hacker
+
+
+def _crack_job(job):
+    ''' Crack one (index, cypher class, text) job and time it '''
+    index, cypher_class, text = job
+    start = perf_counter()
+    matches = _WORKER_HACKERS[cypher_class].operate_cypher(text)
+    return CrackResult(index, cypher_class.__name__, text, matches,
+                       perf_counter() - start)
+
+
+def _crack_chunk(jobs):
+    ''' Crack a list of jobs, see _crack_job '''
+    return [_crack_job(job) for job in jobs]
+
+
+def crack_many(jobs, words_file='src/english_words.txt', index_file=None,
+               workers=None, chunksize=16):
+    '''
+    Crack many cyphers in parallel. <jobs> is an iterable of
+    (cypher_type, text), where cypher_type is a Cypher class or a name in
+    CYPHERS. The jobs are spread over <workers> processes that each load the
+    words once, and a CrackResult with the matches and the time spent is
+    yielded for each job as soon as it and all the jobs before it are done,
+    so the results come in the same order as the jobs.
+
+    The jobs are read <chunksize> at a time, and at most two chunks per
+    worker are waiting at once, so <jobs> can be a long or endless iterator.
+    If the caller stops early, the chunks not yet started are cancelled.
+    '''
+    def prepare(index, job):
+        cypher_type, text = job
+        if isinstance(cypher_type, str):
+            cypher_type = CYPHERS[cypher_type.lower()]
+        return index, cypher_type, text
+
+    workers = workers or os.cpu_count() or 1
+    prepared = (prepare(i, job) for i, job in enumerate(jobs))
+    chunks = iter(lambda: list(itertools.islice(prepared, chunksize)), [])
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(words_file, index_file)) as executor:
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(executor.submit(_crack_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+# Fewer blocks than this are done in this process, where starting the
+# processes would take longer than the pows
+RSA_PARALLEL_MIN_BLOCKS = 256
+
+# The key and operation of an RSA worker process
+_WORKER_RSA = {}
+
+
+def _init_rsa_worker(key, decode):
+    ''' Keep the key when a worker process starts, so it is sent once '''
+    _WORKER_RSA['key'] = key
+    _WORKER_RSA['decode'] = decode
+
+
+def _rsa_job(blocks):
+    ''' Encode or decode a slice of the blocks with the worker's key '''
+    rsa = RSA()
+    if _WORKER_RSA['decode']:
+        return rsa.decode_blocks(blocks, _WORKER_RSA['key'])
+    return rsa.encode_blocks(blocks, _WORKER_RSA['key'])
+
+
+def rsa_bulk(blocks, key, decode=False, workers=None,
+             min_blocks=RSA_PARALLEL_MIN_BLOCKS) -> [int]:
+    '''
+    Encode, or decode if <decode> is set, the RSA <blocks> with <key> over
+    <workers> processes, and return the blocks in the same order. The key is
+    sent to each process once, and the blocks go in one slice per process.
+    Less than <min_blocks> blocks, or a single worker, stay in this process.
+    '''
+    blocks = list(blocks)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(blocks) < min_blocks:
+        rsa = RSA()
+        if decode:
+            return rsa.decode_blocks(blocks, key)
+        return rsa.encode_blocks(blocks, key)
+
+    size = -(-len(blocks) // workers)
+    slices = [blocks[i:i + size] for i in range(0, len(blocks), size)]
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_rsa_worker,
+                             initargs=(key, decode)) as executor:
+        results = executor.map(_rsa_job, slices)
+        return [block for result in results for block in result]
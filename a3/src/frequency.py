@@ -0,0 +1,194 @@
+'''
+Letter statistics for cracking the classical cyphers by frequency analysis.
+Texts are given as arrays of indexes in the alphabet (see
+crypto.text_to_codes), and every histogram is computed once, in time linear
+in the length of the text.
+'''
+
+import functools
+import numpy as np
+
+ALPHLEN = 26
+
+# Relative frequency of each letter a-z in English text
+ENGLISH_FREQUENCIES = np.array([
+    8.167, 1.492, 2.782, 4.253, 12.702, 2.228, 2.015, 6.094, 6.966, 0.153,
+    0.772, 4.025, 2.406, 6.749, 7.507, 1.929, 0.095, 5.987, 6.327, 9.056,
+    2.758, 0.978, 2.360, 0.150, 1.974, 0.074]) / 100
+
+LETTER_LOG_PROBS = np.log(ENGLISH_FREQUENCIES / ENGLISH_FREQUENCIES.sum())
+
+# Index of coincidence of English text and of uniformly random letters
+ENGLISH_IOC = float((ENGLISH_FREQUENCIES ** 2).sum())
+RANDOM_IOC = 1 / ALPHLEN
+
+# Columns with fewer letters than this give too noisy an index of coincidence
+MIN_COLUMN_LETTERS = 4
+
+
+@functools.lru_cache(maxsize=4)
+def bigram_log_probs(words) -> np.ndarray:
+    '''
+    Log probability of each pair of letters, as a ALPHLEN x ALPHLEN array,
+    counted from the pairs of adjacent letters in <words>. Every pair is
+    counted once more than it appears, so no pair is impossible.
+    '''
+    plain = [word for word in words
+             if word.isascii() and word.isalpha() and word.islower()]
+    chars = np.frombuffer(' '.join(plain).encode('ascii'), dtype=np.uint8)
+    first, second = chars[:-1].astype(np.int64), chars[1:].astype(np.int64)
+    inside = (first != ord(' ')) & (second != ord(' '))
+    pairs = (first[inside] - ord('a')) * ALPHLEN + second[inside] - ord('a')
+    counts = np.bincount(pairs, minlength=ALPHLEN * ALPHLEN) + 1
+    return np.log(counts / counts.sum()).reshape(ALPHLEN, ALPHLEN)
+
+
+def histogram(codes: np.ndarray) -> np.ndarray:
+    ''' Number of times each letter occurs in <codes> '''
+    return np.bincount(codes, minlength=ALPHLEN)
+
+
+def bigram_histogram(codes: np.ndarray) -> np.ndarray:
+    ''' Number of times each pair of adjacent letters occurs in <codes> '''
+    codes = codes.astype(np.int64)
+    pairs = codes[:-1] * ALPHLEN + codes[1:]
+    return np.bincount(pairs, minlength=ALPHLEN * ALPHLEN).reshape(
+        ALPHLEN, ALPHLEN)
+
+
+def score_tables(tables: np.ndarray, counts: np.ndarray,
+                 pair_counts: np.ndarray, bigrams: np.ndarray) -> np.ndarray:
+    '''
+    Log likelihood of the text with letter histogram <counts> and pair
+    histogram <pair_counts> after decoding with each row of <tables>, where
+    row i maps each letter of the cypher text to the letter it decodes to.
+    Only the histograms are used, so the text itself is never decoded.
+    '''
+    letters = (LETTER_LOG_PROBS[tables] * counts).sum(axis=1)
+    pairs = (bigrams[tables[:, :, None], tables[:, None, :]] *
+             pair_counts).sum(axis=(1, 2))
+    return letters + pairs
+
+
+def score_codes(codes: np.ndarray, bigrams: np.ndarray) -> float:
+    ''' Log likelihood of the text <codes> as English '''
+    identity = np.arange(ALPHLEN)[None, :]
+    return float(score_tables(identity, histogram(codes),
+                              bigram_histogram(codes), bigrams)[0])
+
+
+def index_of_coincidence(counts: np.ndarray) -> np.ndarray:
+    '''
+    Probability that two letters picked from a text with the letter
+    histogram <counts> are the same. Works on the last axis, so a histogram
+    per row gives one index per row.
+    '''
+    total = counts.sum(axis=-1)
+    pairs = (counts * (counts - 1)).sum(axis=-1)
+    return pairs / np.maximum(total * (total - 1), 1)
+
+
+def column_histograms(codes: np.ndarray, period: int) -> np.ndarray:
+    '''
+    Letter histograms of the <period> columns of <codes>, where column i
+    holds the letters at positions i, i + period, i + 2 * period, ...
+    '''
+    columns = np.arange(len(codes)) % period
+    return np.bincount(columns * ALPHLEN + codes,
+                       minlength=period * ALPHLEN).reshape(period, ALPHLEN)
+
+
+def rank_key_lengths(codes: np.ndarray, max_length: int) -> [int]:
+    '''
+    Rank the key lengths 1..<max_length> of a repeating key by how English
+    the columns of <codes> look with that key length. The lengths whose
+    columns have an average index of coincidence closer to ENGLISH_IOC than
+    to RANDOM_IOC come first, shortest first, as every multiple of the key
+    length looks just as English. The rest follow from the most to the least
+    English. Lengths with fewer than MIN_COLUMN_LETTERS letters per column
+    are left out, except length 1.
+    '''
+    max_length = min(max_length, len(codes) // MIN_COLUMN_LETTERS)
+    threshold = (ENGLISH_IOC + RANDOM_IOC) / 2
+    english = []
+    others = []
+    for length in range(1, max(max_length, 1) + 1):
+        index = index_of_coincidence(column_histograms(codes, length)).mean()
+        if index >= threshold:
+            english.append(length)
+        else:
+            others.append((index, length))
+    others.sort(key=lambda pair: (-pair[0], pair[1]))
+    return english + [length for _, length in others]
+
+
+def best_shifts(codes: np.ndarray, period: int) -> np.ndarray:
+    '''
+    For each of the <period> columns of <codes>, the shift s that makes the
+    column most English when it is decoded as c - s
+    '''
+    counts = column_histograms(codes, period)
+    shifts = np.arange(ALPHLEN)
+    # decoded[s, c] is the letter c decodes to with shift s
+    decoded = (shifts[None, :] - shifts[:, None]) % ALPHLEN
+    scores = counts @ LETTER_LOG_PROBS[decoded].T
+    return scores.argmax(axis=1)
+
+
+def refine_shifts(codes: np.ndarray, shifts, bigrams: np.ndarray,
+                  rounds: int = 2, max_letters: int = 2000) -> np.ndarray:
+    '''
+    Improve the <shifts> of a repeating key found column by column, by
+    trying every shift for each letter of the key in turn and keeping the one
+    that makes the whole text decoded as c - shift most English, pairs of
+    letters included. Short columns have too few letters to find their shift
+    alone, but the pairs they make with the columns next to them tell. Stops
+    after <rounds> passes over the key, or when a pass changes nothing. Only
+    the first <max_letters> letters are decoded, as longer texts have enough
+    letters in each column to begin with.
+    '''
+    shifts = np.array(shifts, dtype=np.int64)
+    codes = codes[:max_letters].astype(np.int64)
+    positions = np.arange(len(codes)) % len(shifts)
+    for _ in range(rounds):
+        changed = False
+        for i in range(len(shifts)):
+            old = shifts[i]
+            scores = []
+            for shift in range(ALPHLEN):
+                shifts[i] = shift
+                scores.append(score_codes((codes - shifts[positions]) %
+                                          ALPHLEN, bigrams))
+            best = int(np.argmax(scores))
+            changed |= best != old
+            shifts[i] = best
+        if not changed:
+            break
+    return shifts
+
+
+def segment_words(text: str, words, max_word_length: int = 30):
+    '''
+    Split <text> into as few words from <words> as possible. Returns the list
+    of words, or None if <text> can not be split into words.
+    '''
+    length = len(text)
+    # fewest[i] is the number of words in the best split of text[:i]
+    fewest = [0] + [None] * length
+    start = [0] * (length + 1)
+    for end in range(1, length + 1):
+        for begin in range(max(0, end - max_word_length), end):
+            if fewest[begin] is None or text[begin:end] not in words:
+                continue
+            if fewest[end] is None or fewest[begin] + 1 < fewest[end]:
+                fewest[end] = fewest[begin] + 1
+                start[end] = begin
+    if fewest[length] is None:
+        return None
+
+    split = []
+    end = length
+    while end > 0:
+        split.append(text[start[end]:end])
+        end = start[end]
+    return split[::-1]
@@ -1,5 +1,9 @@
 import crypto as c
+import itertools
+import os
 import random
+import tempfile
+import word_index as wi
 
 
 def test_hacker(tests, test_words):
@@ -11,6 +15,47 @@ def test_hacker(tests, test_words):
             assert word in dec, f'Hacking of {test[1]}-cypher of "{word}" fail'
 
 
+def test_hacker_batch(tests, test_words):
+    for test in tests[:3]:
+        h = c.Hacker(test[1])
+        encoded = [test[1].encode(word, test[2]) for word in test_words]
+        decoded = h.operate_cypher_batch(encoded)
+        for word, enc, dec in zip(test_words, encoded, decoded):
+            assert word in dec, f'Batch hacking of {test[0]} "{word}" fail'
+            assert dec == h.operate_cypher(enc), f'{test[0]} batch mismatch'
+
+
+def test_word_index(test_words):
+    handle, index_file = tempfile.mkstemp(suffix='.idx')
+    os.close(handle)
+    try:
+        wi.build_index('src/english_words.txt', index_file)
+        index = wi.WordIndex(index_file)
+        assert len(index) == len(wi.load_words('src/english_words.txt'))
+        for word in test_words:
+            assert word in index, f'"{word}" missing from the word index'
+            assert word + 'qx' not in index, f'"{word}qx" in the word index'
+        index.map.close()
+    finally:
+        os.remove(index_file)
+
+
+def test_crack_many(tests, test_words):
+    jobs = [(type(test[1]), test[1].encode(word, test[2]))
+            for test in tests for word in test_words]
+    results = list(c.crack_many(jobs, workers=2))
+    assert [r.index for r in results] == list(range(len(jobs)))
+    for result, word in zip(results, test_words * len(tests)):
+        assert word in result.matches, f'crack_many failed on "{word}"'
+
+    # Stopping early must not wait for an endless iterator of jobs
+    endless = itertools.cycle(jobs)
+    results = c.crack_many(endless, workers=2, chunksize=2)
+    first = [next(results) for _ in range(len(jobs) + 1)]
+    results.close()
+    assert first[-1].matches == first[0].matches, 'crack_many out of order'
+
+
 def test_cyphers(tests, test_words):
     for test in tests:
         for word in test_words:
@@ -18,22 +63,77 @@ def test_cyphers(tests, test_words):
             assert verify, f'{test[0]} failed with input "{word}"'
 
 
+def test_streams(tests, test_words):
+    text = ' '.join(test_words * 20)
+    data = text.encode('latin_1')
+    for test in tests:
+        chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+        enc = b''.join(test[1].encode_stream(chunks, test[2]))
+        assert enc.decode() == test[1].encode(text, test[2]), \
+            f'{test[0]} stream encoding differs from encode'
+        enc_chunks = [enc[i:i + 5] for i in range(0, len(enc), 5)]
+        dec = b''.join(test[1].decode_stream(enc_chunks, test[2]))
+        assert dec.decode() == test[1].decode(enc.decode(), test[2]), \
+            f'{test[0]} stream decoding differs from decode'
+
+
+def test_crack_frequency(tests):
+    text = ('itwasthebestoftimesitwastheworstoftimesitwastheageofwisdom'
+            'itwastheageoffoolishnessitwastheepochofbeliefitwastheepochof'
+            'incredulityitwastheseasonoflightitwastheseasonofdarkness')
+    short_text = 'meetmeatthelibraryaftermidnightandbringthemapofthecastle'
+    cases = [(test, text) for test in tests[:3]] + [
+        (('Unbreakable', c.Unbreakable(), 'lemon'), text),
+        (('Unbreakable', c.Unbreakable(), 'cryptography'), text),
+        (('Unbreakable', c.Unbreakable(), 'a'), short_text),
+        (('Unbreakable', c.Unbreakable(), 'zebra'), short_text),
+    ]
+    for test, plain in cases:
+        h = c.Hacker(test[1])
+        enc = test[1].encode(plain, test[2])
+        best = h.crack_frequency(enc)[0]
+        assert best.text == plain, \
+            f'Frequency analysis of {test[0]} with key {test[2]} failed'
+        assert best.words is not None, f'{test[0]} text not split in words'
+        assert best.key == test[2], \
+            f'{test[0]} found the key {best.key} instead of {test[2]}'
+
+
 def test_rsa():
     r = c.Reciever(c.RSA())
     key = r.generate_keys(bits=8)
     s = c.Sender(c.RSA())
     s.set_key(key)
 
-    text = 'KODE'
+    for text in ['KODE', '', 'Blåbærsyltetøy ' * 50]:
+        enc = s.operate_cypher(text)
+        dec = r.operate_cypher(enc)
+        assert dec == text, f'RSA decrypt failed. Should be "{text}", ' \
+            f'was "{dec}"'
+
+    key = r.generate_keys(bits=256)
+    s.set_key(key)
+    text = 'KODE' * 100
     enc = s.operate_cypher(text)
-    dec = r.operate_cypher(enc)
-    assert dec == text, f'RSA decrypt failed. Should be "{text}", was "{dec}"'
+    assert len(enc) < len(text) // 10, 'RSA blocks are not packed'
+    assert r.operate_cypher(enc) == text, 'RSA decrypt failed with 256 bits'
+
+    plain_key = (r.get_key().n, r.get_key().d)
+    assert c.RSA().decode(enc, plain_key) == text, 'RSA (n, d) decrypt failed'
+
+    rsa = c.RSA()
+    blocks = rsa.blocks_from_text(text * 10, key[0])
+    bulk = c.rsa_bulk(blocks, key, workers=3, min_blocks=1)
+    assert bulk == rsa.encode_blocks(blocks, key), 'RSA bulk encode differs'
+    dec = c.rsa_bulk(bulk, r.get_key(), decode=True, workers=3, min_blocks=1)
+    assert dec == blocks, 'RSA bulk decrypt failed'
+    assert rsa.decode_bulk(rsa.encode_bulk(text, key), r.get_key()) == text
 
 
 def main():
     with open('src/english_words.txt', 'r') as word_file:
         words = {line.rstrip('\n') for line in word_file}
-    random_words = [random.sample(words, 1)[0] for i in range(5)]
+    random_words = [random.sample(sorted(words), 1)[0] for i in range(5)]
 
     tests = [
         ('Caesar', c.Caesar(), random.randint(1, c.ALPHLEN-1)),
@@ -44,6 +144,11 @@ def main():
 
     test_cyphers(tests, random_words)
     test_hacker(tests, random_words)
+    test_hacker_batch(tests, random_words)
+    test_word_index(random_words)
+    test_crack_many(tests, random_words)
+    test_streams(tests, random_words)
+    test_crack_frequency(tests)
     test_rsa()
 
 
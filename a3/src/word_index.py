@@ -0,0 +1,126 @@
+'''
+Dictionaries of words for the Hacker: a set that is loaded once per process,
+and a prebuilt index file that is memory-mapped and shared between processes
+'''
+
+from bisect import bisect_left
+import functools
+import mmap
+import struct
+import sys
+
+_MAGIC = b'WORDIDX1'
+_HEADER = struct.Struct('<8sI')
+_BUCKET = struct.Struct('<QI')
+
+
+@functools.lru_cache(maxsize=None)
+def load_words(path: str) -> frozenset:
+    '''
+    Load words from a file containing one word per line. The set is cached,
+    so each file is only read once per process.
+    '''
+    with open(path, 'r') as word_file:
+        return frozenset(line.rstrip('\n') for line in word_file)
+
+
+def build_index(words_path: str, index_path: str):
+    '''
+    Write the words in <words_path> to an index at <index_path>. The words
+    are stored as UTF-8, bucketed by their length in bytes, and sorted within
+    each bucket as fixed width records, so they can be binary searched in
+    place. The file starts with a table of (offset, count) per length.
+    '''
+    buckets = {}
+    for word in load_words(words_path):
+        data = word.encode('utf_8')
+        buckets.setdefault(len(data), []).append(data)
+
+    num_buckets = max(buckets, default=-1) + 1
+    offset = _HEADER.size + num_buckets * _BUCKET.size
+    table = []
+    for length in range(num_buckets):
+        bucket = buckets.get(length, [])
+        table.append(_BUCKET.pack(offset, len(bucket)))
+        offset += length * len(bucket)
+
+    with open(index_path, 'wb') as index_file:
+        index_file.write(_HEADER.pack(_MAGIC, num_buckets))
+        index_file.write(b''.join(table))
+        for length in range(num_buckets):
+            index_file.write(b''.join(sorted(buckets.get(length, []))))
+
+
+class WordIndex():
+    '''
+    Read only view of an index written by build_index. Opening it only reads
+    the table of buckets, and the words are looked up straight from the
+    memory-mapped file, so processes using the same index share its pages.
+    '''
+
+    def __init__(self, index_path: str):
+        with open(index_path, 'rb') as index_file:
+            self.map = mmap.mmap(index_file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        magic, num_buckets = _HEADER.unpack_from(self.map, 0)
+        if magic != _MAGIC:
+            raise ValueError('{} is not a word index'.format(index_path))
+        self.buckets = [_BUCKET.unpack_from(self.map,
+                                            _HEADER.size + i * _BUCKET.size)
+                        for i in range(num_buckets)]
+
+    def __contains__(self, word: str) -> bool:
+        data = word.encode('utf_8')
+        length = len(data)
+        if length >= len(self.buckets):
+            return False
+        bucket = _Bucket(self.map, length, *self.buckets[length])
+        i = bisect_left(bucket, data)
+        return i < len(bucket) and bucket[i] == data
+
+    def __len__(self) -> int:
+        return sum(count for _, count in self.buckets)
+
+    def __iter__(self):
+        for length in range(len(self.buckets)):
+            yield from self.words_of_length(length)
+
+    def words_of_length(self, length: int) -> [str]:
+        ''' All the words that are <length> bytes long, in sorted order '''
+        if length >= len(self.buckets):
+            return []
+        offset, count = self.buckets[length]
+        data = self.map[offset:offset + length * count].decode('utf_8')
+        if length == 0:
+            return [''] * count
+        return [data[i:i + length] for i in range(0, len(data), length)]
+
+
+class _Bucket():
+    ''' The sorted records of one length, as a sequence for bisect '''
+
+    def __init__(self, data, length, offset, count):
+        self.data = data
+        self.length = length
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = self.offset + i * self.length
+        return self.data[start:start + self.length]
+
+
+@functools.lru_cache(maxsize=None)
+def open_index(index_path: str) -> WordIndex:
+    ''' Open the index at <index_path>, once per process '''
+    return WordIndex(index_path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python word_index.py <words file> <index file>')
+        sys.exit(2)
+    build_index(sys.argv[1], sys.argv[2])